@@ -2,18 +2,133 @@
 图表生成智能体
 负责生成报告中需要的图表、表格和数据可视化
 """
+import asyncio
+import logging
 import os
+import re
+import html
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-import plotly.graph_objects as go
-import plotly.express as px
+import pathlib
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional
-from utils.llm_client import LLMClient
+from utils.llm_client import LLMClient, raise_if_retryable
+from utils.llm_cache import CachedLLMClient
+from utils.retry import is_retryable
+from utils.file_writer import write_text
 
-# 设置中文字体（避免中文显示问题）
-plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
-plt.rcParams['axes.unicode_minus'] = False
+logger = logging.getLogger(__name__)
+
+# 优先使用orjson解析LLM返回的JSON，未安装时回退到标准库
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，异常处理保持不变
+try:
+    import orjson as _json
+except ImportError:
+    _json = json
+_loads = _json.loads
+
+# 位图编码参数：PNG使用最低zlib压缩级别（默认级别6的编码耗时是其数倍），
+# JPG使用85质量；均关闭耗时的optimize多遍扫描
+_PIL_KWARGS = {
+    '.png': {'compress_level': 1, 'optimize': False},
+    '.jpg': {'quality': 85, 'optimize': False},
+}
+
+# 文件名中不安全的字符（空白、标点、路径分隔符等）
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^\w\-]+')
+
+@functools.lru_cache(maxsize=256)
+def _safe_filename(title: str) -> str:
+    """将图表标题转换为安全的文件名片段（保留中文等Unicode字母数字）"""
+    return _UNSAFE_FILENAME_CHARS.sub('_', title)[:20]
+
+@functools.lru_cache(maxsize=None)
+def _get_pyplot():
+    """
+    延迟导入matplotlib.pyplot
+    
+    仅导入agents包（或只生成大纲/内容）时不加载matplotlib，
+    首次真正绘图时才完成后端和字体配置。
+    """
+    import matplotlib
+    matplotlib.use('Agg')  # 无界面渲染后端，必须在导入pyplot之前设置
+    import matplotlib.pyplot as plt
+    
+    # 设置中文字体（避免中文显示问题）
+    plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
+    plt.rcParams['axes.unicode_minus'] = False
+    
+    # 路径简化：减少渲染时需要光栅化的顶点数量
+    plt.rcParams['path.simplify'] = True
+    plt.rcParams['path.simplify_threshold'] = 1.0
+    plt.rcParams['agg.path.chunksize'] = 10000
+    return plt
+
+# 常见的图表类型关键词（按优先顺序）
+_CHART_KEYWORDS = {
+    "柱状图": "bar",
+    "条形图": "bar",
+    "折线图": "line",
+    "饼图": "pie",
+    "散点图": "scatter",
+    "表格": "table"
+}
+
+# 可选：使用Aho-Corasick自动机一次扫描匹配所有关键词，未安装时逐个关键词查找
+try:
+    import ahocorasick
+    _CHART_AUTOMATON = ahocorasick.Automaton()
+    for _keyword in _CHART_KEYWORDS:
+        _CHART_AUTOMATON.add_word(_keyword, _keyword)
+    _CHART_AUTOMATON.make_automaton()
+except ImportError:
+    _CHART_AUTOMATON = None
+
+def _match_chart_keywords(text: str) -> Dict[str, str]:
+    """返回文本中出现的图表类型到首个匹配关键词的映射（按关键词表顺序）"""
+    if _CHART_AUTOMATON is not None:
+        matched = {keyword for _, keyword in _CHART_AUTOMATON.iter(text)}
+    else:
+        matched = {keyword for keyword in _CHART_KEYWORDS if keyword in text}
+    
+    found = {}
+    for keyword, chart_type in _CHART_KEYWORDS.items():
+        if keyword in matched:
+            found.setdefault(chart_type, keyword)
+    return found
+
+# 各图表类型的模拟数据（只读，使用元组防止被意外修改）
+_MOCK_DATA = {
+    "bar": {
+        "categories": ("类别A", "类别B", "类别C", "类别D", "类别E"),
+        "values": (23, 45, 56, 78, 32)
+    },
+    "line": {
+        "x_values": ("2019", "2020", "2021", "2022", "2023"),
+        "y_values": (10, 15, 23, 28, 35)
+    },
+    "pie": {
+        "labels": ("部分1", "部分2", "部分3", "部分4"),
+        "values": (30, 25, 25, 20)
+    },
+    "scatter": {
+        "x_values": (1, 2, 3, 4, 5, 6, 7, 8, 9, 10),
+        "y_values": (2, 5, 3, 8, 7, 10, 9, 12, 15, 14)
+    },
+    "table": {
+        "headers": ("项目", "数值1", "数值2", "比例"),
+        "rows": (
+            ("项目A", "100", "80", "80%"),
+            ("项目B", "120", "100", "83%"),
+            ("项目C", "90", "85", "94%"),
+            ("项目D", "110", "95", "86%")
+        )
+    }
+}
+
+# 可以绘制的图表类型（与 ChartAgent._render 的分支保持一致）
+_RENDERABLE = frozenset({"bar", "line", "pie", "scatter", "table"})
 
 class ChartAgent:
     """
@@ -26,6 +141,17 @@ class ChartAgent:
     4. 智能化：自动选择最适合的图表类型
     """
     
+    # 固定的实例属性：省去每个实例的 __dict__，拼错属性名时直接报错
+    __slots__ = (
+        'llm_client', 'agent_name', 'output_dir', '_out_path', 'chart_counter',
+        'dpi', 'table_format', 'image_format', '_fig', '_ax', '_pie_fig', '_pie_ax', '_fig_lock',
+        'chart_types'
+    )
+    
+    # 图表需求的必填字段和支持的图表类型（与 chart_types 的键保持一致）
+    _REQUIRED = ("chart_type", "title", "description")
+    _SUPPORTED = frozenset({"bar", "line", "pie", "scatter", "histogram", "box", "heatmap", "table"})
+    
     def __init__(self, llm_client: LLMClient, output_dir: str = "output/charts"):
         """
         初始化图表生成智能体
@@ -34,11 +160,27 @@ class ChartAgent:
             llm_client: 大语言模型客户端
             output_dir: 图表输出目录
         """
-        self.llm_client = llm_client
+        self.llm_client = CachedLLMClient.wrap(llm_client)  # 缓存重复的提示词
         self.agent_name = "ChartAgent"
         self.output_dir = output_dir
+        self._out_path = pathlib.Path(output_dir)
         self.chart_counter = 0
         
+        # 图表分辨率：渲染耗时约与DPI的平方成正比，默认120足够屏幕和文档阅读
+        self.dpi = int(os.environ.get('CHART_DPI', 120))
+        # 表格输出格式：html（默认，直接写出无需绘图）、svg 或 png（经matplotlib渲染）
+        self.table_format = os.environ.get('CHART_TABLE_FORMAT', 'html').lower()
+        # 图片格式：png（默认）或 jpg（编码更快、文件更小；饼图需要透明背景，始终使用png）
+        self.image_format = os.environ.get('CHART_FORMAT', 'png').lower()
+        if self.image_format == 'jpeg':
+            self.image_format = 'jpg'
+        
+        # 复用画布：避免每个图表重复创建/销毁Figure和渲染器，字体缓存保持热状态
+        # 画布在首次绘图时创建；Figure不是线程安全的，绘制时需要持有锁
+        self._fig = self._ax = None
+        self._pie_fig = self._pie_ax = None
+        self._fig_lock = threading.Lock()
+        
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
         
@@ -54,12 +196,19 @@ class ChartAgent:
             "table": "表格"
         }
     
-    def analyze_content_for_charts(self, sections_content: Dict[str, str]) -> List[Dict]:
+    def analyze_content_for_charts(self, 
+                                   sections_content: Dict[str, str],
+                                   max_workers: Optional[int] = None,
+                                   batch_size: int = 6,
+                                   system_prompt: Optional[str] = None) -> List[Dict]:
         """
         分析内容并识别图表需求
         
         Args:
             sections_content: 章节内容字典
+            max_workers: 并发分析的最大线程数（默认 min(8, 批次数)）
+            batch_size: 每次LLM调用合并分析的章节数
+            system_prompt: 可选的系统提示词（同一报告的所有分析调用相同，见 agents.prompts）
             
         Returns:
             图表需求列表
@@ -72,16 +221,138 @@ class ChartAgent:
         """
         
         chart_requirements = []
+        if not sections_content:
+            return chart_requirements
+        
+        # 多个章节合并为一次LLM调用，减少网络往返和重复的指令前缀
+        items = list(sections_content.items())
+        batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+        
+        # 各批次相互独立，并行调用LLM，结果按章节顺序合并
+        workers = max_workers or min(8, len(batches))
+        analyze = functools.partial(self._analyze_sections_batch, system_prompt=system_prompt)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch_results in executor.map(analyze, batches):
+                for requirements in batch_results:
+                    chart_requirements.extend(requirements)
+        
+        logger.info("[%s] 识别出 %s 个图表需求", self.agent_name, len(chart_requirements))
+        return chart_requirements
+    
+    async def a_analyze_content_for_charts(self,
+                                           sections_content: Dict[str, str],
+                                           system_prompt: Optional[str] = None) -> List[Dict]:
+        """
+        异步分析内容并识别图表需求
         
-        for section_title, content in sections_content.items():
-            # 使用LLM分析内容的可视化需求
-            requirements = self._analyze_section_for_visualization(section_title, content)
-            chart_requirements.extend(requirements)
+        批次分析内部已经用线程池并发调用LLM，这里放到默认执行器中运行，
+        只是让事件循环在等待期间可以继续处理其他协程
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(
+            self.analyze_content_for_charts, sections_content, system_prompt=system_prompt
+        ))
+    
+    def _analyze_sections_batch(self, items: List[tuple], system_prompt: Optional[str] = None) -> List[List[Dict]]:
+        """
+        在一次LLM调用中分析多个章节的可视化需求
         
-        print(f"[{self.agent_name}] 识别出 {len(chart_requirements)} 个图表需求")
-        return chart_requirements
+        Args:
+            items: (章节标题, 章节内容) 列表
+            system_prompt: 可选的系统提示词
+            
+        Returns:
+            与items一一对应的图表需求列表
+            
+        为什么需要批量分析：
+        1. 效率：N个章节只需一次网络往返
+        2. 成本：分析指令只发送一次，不随章节数重复
+        3. 容错：批量结果无法解析时回退到逐章节分析
+        """
+        
+        if len(items) == 1:
+            return [self._analyze_section_for_visualization(*items[0], system_prompt)]
+        
+        sections_text = "\n\n".join(
+            f"[{i}] {title}\n{content}" for i, (title, content) in enumerate(items, 1)
+        )
+        
+        prompt = f"""
+请分析以下各章节内容，分别识别每个章节中可以用图表可视化的数据和概念：
+
+{sections_text}
+
+请识别以下类型的可视化需求：
+1. 数值比较（适合柱状图、折线图）
+2. 占比关系（适合饼图）
+3. 趋势变化（适合折线图）
+4. 分类统计（适合柱状图）
+5. 相关关系（适合散点图）
+6. 流程步骤（适合流程图）
+7. 层次结构（适合树形图）
+8. 对比表格（适合表格）
+
+每个图表需求包含以下字段：
+- chart_type: 图表类型（bar/line/pie/scatter/table/flow等）
+- title: 图表标题
+- description: 图表描述
+- data_concept: 数据概念描述
+- priority: 优先级（1-5，5最高）
+
+请以JSON对象格式返回，键为章节编号，值为该章节的图表需求数组；
+没有明显可视化需求的章节返回空数组 []。
+
+返回格式：
+{{
+  "1": [
+    {{
+      "chart_type": "bar",
+      "title": "示例图表标题",
+      "description": "图表描述",
+      "data_concept": "数据概念",
+      "priority": 3
+    }}
+  ],
+  "2": []
+}}
+"""
+        
+        try:
+            response = self.llm_client.generate_text(
+                prompt, max_tokens=800 * len(items), system_prompt=system_prompt,
+                response_format={"type": "json_object"}
+            )
+            parsed = _loads(response)
+            if not isinstance(parsed, dict):
+                raise ValueError("批量分析结果不是JSON对象")
+            
+            results = []
+            for i, (title, content) in enumerate(items, 1):
+                requirements = [
+                    req for req in parsed.get(str(i)) or []
+                    if self._validate_chart_requirement(req)
+                ]
+                results.append(self._attach_section_info(requirements, title, content))
+            return results
+            
+        except Exception as e:
+            logger.warning("[%s] 批量可视化分析失败，改为逐章节分析: %s", self.agent_name, e)
+            return [
+                self._analyze_section_for_visualization(title, content, system_prompt)
+                for title, content in items
+            ]
+    
+    def _attach_section_info(self, requirements: List[Dict], section_title: str, content: str) -> List[Dict]:
+        """为图表需求添加章节信息"""
+        for req in requirements:
+            req["section_title"] = section_title
+            req["section_content"] = content[:200] + "..."  # 保存部分内容作为参考
+        return requirements
     
-    def _analyze_section_for_visualization(self, section_title: str, content: str) -> List[Dict]:
+    def _analyze_section_for_visualization(self,
+                                           section_title: str,
+                                           content: str,
+                                           system_prompt: Optional[str] = None) -> List[Dict]:
         """
         分析单个章节的可视化需求
         
@@ -91,7 +362,49 @@ class ChartAgent:
         3. 适配性：根据不同类型的内容选择合适的可视化
         """
         
-        prompt = f"""
+        prompt = self._build_section_prompt(section_title, content)
+        
+        try:
+            response = self.llm_client.generate_text(prompt, max_tokens=800, system_prompt=system_prompt)
+            
+            # 尝试解析JSON响应
+            requirements = self._parse_chart_requirements(response)
+            
+            # 添加章节信息
+            return self._attach_section_info(requirements, section_title, content)
+            
+        except Exception as e:
+            logger.warning("[%s] 章节 '%s' 可视化分析失败: %s", self.agent_name, section_title, e)
+            return []
+    
+    async def a_analyze_section_for_charts(self,
+                                           section_title: str,
+                                           content: str,
+                                           system_prompt: Optional[str] = None) -> List[Dict]:
+        """
+        异步分析单个章节的可视化需求（与 _analyze_section_for_visualization 的结果一致）
+        
+        章节内容一生成就可以调用，不必等待所有章节完成或润色结束：
+        图表需求由内容本身决定，润色只改变表达方式；
+        暂时性错误（限流、超时、连接失败、5xx）会重新抛出，由调用方决定是否重试
+        """
+        prompt = self._build_section_prompt(section_title, content)
+        
+        try:
+            response = await self.llm_client.agenerate_text(prompt, max_tokens=800, system_prompt=system_prompt)
+            raise_if_retryable(response)
+            requirements = self._parse_chart_requirements(response)
+            return self._attach_section_info(requirements, section_title, content)
+            
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            logger.warning("[%s] 章节 '%s' 可视化分析失败: %s", self.agent_name, section_title, e)
+            return []
+    
+    def _build_section_prompt(self, section_title: str, content: str) -> str:
+        """构建单个章节可视化分析的提示词"""
+        return f"""
 请分析以下章节内容，识别可以用图表可视化的数据和概念：
 
 章节标题：{section_title}
@@ -128,23 +441,6 @@ class ChartAgent:
   }}
 ]
 """
-        
-        try:
-            response = self.llm_client.generate_text(prompt, max_tokens=800)
-            
-            # 尝试解析JSON响应
-            requirements = self._parse_chart_requirements(response)
-            
-            # 添加章节信息
-            for req in requirements:
-                req["section_title"] = section_title
-                req["section_content"] = content[:200] + "..."  # 保存部分内容作为参考
-            
-            return requirements
-            
-        except Exception as e:
-            print(f"[{self.agent_name}] 章节 '{section_title}' 可视化分析失败: {e}")
-            return []
     
     def _parse_chart_requirements(self, response: str) -> List[Dict]:
         """
@@ -158,7 +454,7 @@ class ChartAgent:
         
         try:
             # 尝试直接解析JSON
-            requirements = json.loads(response)
+            requirements = _loads(response)
             
             # 验证和清理数据
             validated_requirements = []
@@ -182,17 +478,11 @@ class ChartAgent:
         3. 标准化：确保数据格式符合标准
         """
         
-        required_fields = ["chart_type", "title", "description"]
-        
-        for field in required_fields:
-            if field not in requirement or not requirement[field]:
-                return False
-        
-        # 检查图表类型是否支持
-        if requirement["chart_type"] not in self.chart_types:
-            return False
-        
-        return True
+        return (
+            isinstance(requirement, dict)
+            and all(requirement.get(field) for field in self._REQUIRED)
+            and requirement["chart_type"] in self._SUPPORTED
+        )
     
     def generate_charts(self, chart_requirements: List[Dict]) -> Dict[str, str]:
         """
@@ -212,13 +502,54 @@ class ChartAgent:
                 chart_path = self._generate_single_chart(requirement)
                 if chart_path:
                     generated_charts[requirement["title"]] = chart_path
-                    print(f"[{self.agent_name}] 已生成图表: {requirement['title']}")
+                    logger.info("[%s] 已生成图表: %s", self.agent_name, requirement['title'])
                 
             except Exception as e:
-                print(f"[{self.agent_name}] 图表生成失败 '{requirement['title']}': {e}")
+                logger.warning("[%s] 图表生成失败 '%s': %s", self.agent_name, requirement['title'], e)
         
         return generated_charts
     
+    async def a_generate_charts(self, chart_requirements: List[Dict], executor=None) -> Dict[str, str]:
+        """
+        异步生成图表
+        
+        Args:
+            chart_requirements: 图表需求列表
+            executor: 可选的进程池；提供时各图表在工作进程中并行渲染
+            
+        Returns:
+            图表文件路径字典
+        
+        编号、文件名和数据在主进程中确定，只有绘图放到进程池执行；
+        未提供进程池时在默认执行器中串行绘制（共享同一块画布），均不阻塞事件循环
+        """
+        loop = asyncio.get_running_loop()
+        if executor is None:
+            return await loop.run_in_executor(None, self.generate_charts, chart_requirements)
+        
+        jobs = []
+        for requirement in chart_requirements:
+            try:
+                job = self._prepare_chart_job(requirement)
+                if job:
+                    jobs.append((requirement["title"], job))
+            except Exception as e:
+                logger.warning("[%s] 图表生成失败 '%s': %s", self.agent_name, requirement.get('title'), e)
+        
+        results = await asyncio.gather(
+            *(loop.run_in_executor(executor, _render_chart, job, self.dpi) for _, job in jobs),
+            return_exceptions=True
+        )
+        
+        generated_charts = {}
+        for (title, _), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                logger.warning("[%s] 图表生成失败 '%s': %s", self.agent_name, title, result)
+            else:
+                generated_charts[title] = result
+                logger.info("[%s] 已生成图表: %s", self.agent_name, title)
+        return generated_charts
+    
     def _generate_single_chart(self, requirement: Dict) -> Optional[str]:
         """
         生成单个图表
@@ -229,6 +560,20 @@ class ChartAgent:
         3. 可扩展：易于添加新的图表类型
         """
         
+        job = self._prepare_chart_job(requirement)
+        if job is None:
+            return None
+        
+        self._render(*job)
+        return job[3]
+    
+    def _prepare_chart_job(self, requirement: Dict) -> Optional[tuple]:
+        """
+        准备绘图任务 (chart_type, title, data, filepath)，不支持的图表类型返回None
+        
+        数据和文件名在这里确定，绘图本身（_render）可以在其他进程中执行
+        """
+        
         chart_type = requirement["chart_type"]
         title = requirement["title"]
         
@@ -237,10 +582,21 @@ class ChartAgent:
         
         # 生成文件名
         self.chart_counter += 1
-        filename = f"chart_{self.chart_counter:03d}_{chart_type}_{title[:20]}.png"
-        filepath = os.path.join(self.output_dir, filename)
+        ext = self.image_format if chart_type != "pie" else "png"
+        filename = f"chart_{self.chart_counter:03d}_{chart_type}_{_safe_filename(title)}.{ext}"
+        filepath = str(self._out_path / filename)
+        
+        if chart_type not in _RENDERABLE:
+            logger.warning("[%s] 不支持的图表类型: %s", self.agent_name, chart_type)
+            return None
         
-        # 根据图表类型生成图表
+        if chart_type == "table" and self.table_format in ("html", "svg"):
+            filepath = os.path.splitext(filepath)[0] + "." + self.table_format
+        
+        return chart_type, title, data, filepath
+    
+    def _render(self, chart_type: str, title: str, data: Dict, filepath: str):
+        """根据图表类型绘制并保存图表"""
         if chart_type == "bar":
             self._create_bar_chart(data, title, filepath)
         elif chart_type == "line":
@@ -251,11 +607,16 @@ class ChartAgent:
             self._create_scatter_chart(data, title, filepath)
         elif chart_type == "table":
             self._create_table_chart(data, title, filepath)
-        else:
-            print(f"[{self.agent_name}] 不支持的图表类型: {chart_type}")
-            return None
-        
-        return filepath
+    
+    @classmethod
+    def _create_renderer(cls) -> "ChartAgent":
+        """创建只用于绘图的实例（不初始化LLM客户端和输出目录），供进程池的工作进程使用"""
+        renderer = cls.__new__(cls)
+        renderer.dpi = 120
+        renderer._fig = renderer._ax = None
+        renderer._pie_fig = renderer._pie_ax = None
+        renderer._fig_lock = threading.Lock()
+        return renderer
     
     def _generate_mock_data(self, requirement: Dict) -> Dict:
         """
@@ -274,112 +635,138 @@ class ChartAgent:
         4. 让用户提供真实数据
         """
         
-        chart_type = requirement["chart_type"]
+        # 模拟数据为只读的模块级常量，绘图方法只读取不修改，无需复制
+        return _MOCK_DATA.get(requirement["chart_type"], {})
+    
+    def _ensure_figures(self):
+        """首次绘图时创建复用的画布（调用方需持有 _fig_lock）"""
+        if self._fig is None:
+            plt = _get_pyplot()
+            self._fig, self._ax = plt.subplots(figsize=(10, 6))
+            self._pie_fig, self._pie_ax = plt.subplots(figsize=(8, 8))
+    
+    def _reset_axes(self, ax):
+        """清空复用的坐标轴，恢复为默认状态"""
+        ax.clear()
+        ax.set_axis_on()
+    
+    def _save_figure(self, fig, filepath: str):
+        """
+        保存复用的画布
         
-        # 根据不同图表类型生成相应的模拟数据
-        if chart_type == "bar":
-            return {
-                "categories": ["类别A", "类别B", "类别C", "类别D", "类别E"],
-                "values": [23, 45, 56, 78, 32]
-            }
-        elif chart_type == "line":
-            return {
-                "x_values": ["2019", "2020", "2021", "2022", "2023"],
-                "y_values": [10, 15, 23, 28, 35]
-            }
-        elif chart_type == "pie":
-            return {
-                "labels": ["部分1", "部分2", "部分3", "部分4"],
-                "values": [30, 25, 25, 20]
-            }
-        elif chart_type == "scatter":
-            return {
-                "x_values": [1, 2, 3, 4, 5, 6, 7, 8, 9, 10],
-                "y_values": [2, 5, 3, 8, 7, 10, 9, 12, 15, 14]
-            }
-        elif chart_type == "table":
-            return {
-                "headers": ["项目", "数值1", "数值2", "比例"],
-                "rows": [
-                    ["项目A", "100", "80", "80%"],
-                    ["项目B", "120", "100", "83%"],
-                    ["项目C", "90", "85", "94%"],
-                    ["项目D", "110", "95", "86%"]
-                ]
-            }
-        else:
-            return {}
+        不使用 bbox_inches='tight'：它会让matplotlib先完整渲染一次来计算边界再保存，
+        相当于绘制两遍；tight_layout() 已经处理了边距。
+        位图编码参数见 _PIL_KWARGS
+        """
+        fig.tight_layout()
+        fig.savefig(filepath, dpi=self.dpi, pil_kwargs=_PIL_KWARGS.get(os.path.splitext(filepath)[1]))
     
     def _create_bar_chart(self, data: Dict, title: str, filepath: str):
         """创建柱状图"""
-        plt.figure(figsize=(10, 6))
-        plt.bar(data["categories"], data["values"], color='skyblue', edgecolor='navy', alpha=0.7)
-        plt.title(title, fontsize=16, fontweight='bold')
-        plt.xlabel('类别', fontsize=12)
-        plt.ylabel('数值', fontsize=12)
-        plt.xticks(rotation=45)
-        plt.grid(axis='y', alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(filepath, dpi=300, bbox_inches='tight')
-        plt.close()
+        with self._fig_lock:
+            self._ensure_figures()
+            ax = self._ax
+            self._reset_axes(ax)
+            ax.bar(data["categories"], data["values"], color='skyblue', edgecolor='navy', alpha=0.7)
+            ax.set_title(title, fontsize=16, fontweight='bold')
+            ax.set_xlabel('类别', fontsize=12)
+            ax.set_ylabel('数值', fontsize=12)
+            ax.tick_params(axis='x', labelrotation=45)
+            ax.grid(axis='y', alpha=0.3)
+            self._save_figure(self._fig, filepath)
     
     def _create_line_chart(self, data: Dict, title: str, filepath: str):
         """创建折线图"""
-        plt.figure(figsize=(10, 6))
-        plt.plot(data["x_values"], data["y_values"], marker='o', linewidth=2, markersize=8)
-        plt.title(title, fontsize=16, fontweight='bold')
-        plt.xlabel('时间', fontsize=12)
-        plt.ylabel('数值', fontsize=12)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(filepath, dpi=300, bbox_inches='tight')
-        plt.close()
+        with self._fig_lock:
+            self._ensure_figures()
+            ax = self._ax
+            self._reset_axes(ax)
+            ax.plot(data["x_values"], data["y_values"], marker='o', linewidth=2, markersize=8)
+            ax.set_title(title, fontsize=16, fontweight='bold')
+            ax.set_xlabel('时间', fontsize=12)
+            ax.set_ylabel('数值', fontsize=12)
+            ax.grid(True, alpha=0.3)
+            self._save_figure(self._fig, filepath)
     
     def _create_pie_chart(self, data: Dict, title: str, filepath: str):
         """创建饼图"""
-        plt.figure(figsize=(8, 8))
-        colors = ['#ff9999', '#66b3ff', '#99ff99', '#ffcc99']
-        plt.pie(data["values"], labels=data["labels"], autopct='%1.1f%%', 
-                colors=colors, startangle=90)
-        plt.title(title, fontsize=16, fontweight='bold')
-        plt.axis('equal')
-        plt.tight_layout()
-        plt.savefig(filepath, dpi=300, bbox_inches='tight')
-        plt.close()
+        with self._fig_lock:
+            self._ensure_figures()
+            ax = self._pie_ax
+            self._reset_axes(ax)
+            colors = ['#ff9999', '#66b3ff', '#99ff99', '#ffcc99']
+            ax.pie(data["values"], labels=data["labels"], autopct='%1.1f%%', 
+                   colors=colors, startangle=90)
+            ax.set_title(title, fontsize=16, fontweight='bold')
+            ax.axis('equal')
+            self._save_figure(self._pie_fig, filepath)
     
     def _create_scatter_chart(self, data: Dict, title: str, filepath: str):
         """创建散点图"""
-        plt.figure(figsize=(10, 6))
-        plt.scatter(data["x_values"], data["y_values"], alpha=0.7, s=100)
-        plt.title(title, fontsize=16, fontweight='bold')
-        plt.xlabel('X值', fontsize=12)
-        plt.ylabel('Y值', fontsize=12)
-        plt.grid(True, alpha=0.3)
-        plt.tight_layout()
-        plt.savefig(filepath, dpi=300, bbox_inches='tight')
-        plt.close()
+        with self._fig_lock:
+            self._ensure_figures()
+            ax = self._ax
+            self._reset_axes(ax)
+            ax.scatter(data["x_values"], data["y_values"], alpha=0.7, s=100)
+            ax.set_title(title, fontsize=16, fontweight='bold')
+            ax.set_xlabel('X值', fontsize=12)
+            ax.set_ylabel('Y值', fontsize=12)
+            ax.grid(True, alpha=0.3)
+            self._save_figure(self._fig, filepath)
     
     def _create_table_chart(self, data: Dict, title: str, filepath: str):
-        """创建表格图"""
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.axis('tight')
-        ax.axis('off')
-        
-        table = ax.table(cellText=data["rows"], colLabels=data["headers"],
-                        cellLoc='center', loc='center')
-        table.auto_set_font_size(False)
-        table.set_fontsize(12)
-        table.scale(1.2, 1.5)
-        
-        # 设置表格样式
-        for i in range(len(data["headers"])):
-            table[(0, i)].set_facecolor('#4CAF50')
-            table[(0, i)].set_text_props(weight='bold', color='white')
-        
-        plt.title(title, fontsize=16, fontweight='bold', pad=20)
-        plt.tight_layout()
-        plt.savefig(filepath, dpi=300, bbox_inches='tight')
-        plt.close()
+        """
+        创建表格图
+        
+        为什么默认输出HTML：
+        1. 速度：表格本身就是结构化文本，直接写出比matplotlib排版光栅化快几个数量级
+        2. 质量：文字可选中、可缩放，在报告中显示效果更好
+        3. 兼容：仍可通过 CHART_TABLE_FORMAT=png/svg 生成图片
+        """
+        if filepath.endswith(".html"):
+            self._write_table_html(data, title, filepath)
+            return
+        
+        with self._fig_lock:
+            self._ensure_figures()
+            ax = self._ax
+            self._reset_axes(ax)
+            ax.axis('tight')
+            ax.axis('off')
+            
+            table = ax.table(cellText=data["rows"], colLabels=data["headers"],
+                             cellLoc='center', loc='center')
+            table.auto_set_font_size(False)
+            table.set_fontsize(12)
+            table.scale(1.2, 1.5)
+            
+            # 设置表格样式
+            for i in range(len(data["headers"])):
+                table[(0, i)].set_facecolor('#4CAF50')
+                table[(0, i)].set_text_props(weight='bold', color='white')
+            
+            ax.set_title(title, fontsize=16, fontweight='bold', pad=20)
+            self._save_figure(self._fig, filepath)
+    
+    def _write_table_html(self, data: Dict, title: str, filepath: str):
+        """将表格直接写为带内联样式的HTML片段"""
+        cell_style = 'border:1px solid #ddd;padding:6px 12px;text-align:center'
+        header_style = cell_style + ';background:#4CAF50;color:white;font-weight:bold'
+        
+        parts = [
+            '<table style="border-collapse:collapse;margin:0 auto">',
+            f'<caption style="font-size:16px;font-weight:bold;padding:8px">{html.escape(title)}</caption>',
+            '<tr>',
+        ]
+        parts.extend(f'<th style="{header_style}">{html.escape(str(h))}</th>' for h in data["headers"])
+        parts.append('</tr>')
+        for row in data["rows"]:
+            parts.append('<tr>')
+            parts.extend(f'<td style="{cell_style}">{html.escape(str(cell))}</td>' for cell in row)
+            parts.append('</tr>')
+        parts.append('</table>\n')
+        
+        write_text(filepath, '\n'.join(parts))
     
     def _extract_requirements_from_text(self, text: str) -> List[Dict]:
         """
@@ -392,25 +779,36 @@ class ChartAgent:
         """
         
         # 这是一个简化的实现，实际项目中可以使用更复杂的文本解析
-        requirements = []
-        
-        # 查找常见的图表类型关键词
-        chart_keywords = {
-            "柱状图": "bar",
-            "条形图": "bar", 
-            "折线图": "line",
-            "饼图": "pie",
-            "散点图": "scatter",
-            "表格": "table"
-        }
-        
-        for keyword, chart_type in chart_keywords.items():
-            if keyword in text:
-                requirements.append({
-                    "chart_type": chart_type,
-                    "title": f"{keyword}示例",
-                    "description": f"基于内容生成的{keyword}",
-                    "priority": 3
-                })
+        # 每种图表类型只取一个需求，按关键词表顺序排列
+        requirements = [
+            {
+                "chart_type": chart_type,
+                "title": f"{keyword}示例",
+                "description": f"基于内容生成的{keyword}",
+                "priority": 3
+            }
+            for chart_type, keyword in _match_chart_keywords(text).items()
+        ]
         
         return requirements[:3]  # 最多返回3个需求
+
+# 工作进程内复用的绘图实例（画布和字体缓存在同一进程的多个任务间保持）
+_WORKER_RENDERER = None
+
+def _render_chart(job: tuple, dpi: int) -> str:
+    """
+    进程池的工作函数（模块级函数，可以被pickle）
+    
+    Args:
+        job: ChartAgent._prepare_chart_job 返回的 (chart_type, title, data, filepath)
+        dpi: 图表分辨率
+        
+    Returns:
+        图表文件路径
+    """
+    global _WORKER_RENDERER
+    if _WORKER_RENDERER is None:
+        _WORKER_RENDERER = ChartAgent._create_renderer()
+    _WORKER_RENDERER.dpi = dpi
+    _WORKER_RENDERER._render(*job)
+    return job[3]
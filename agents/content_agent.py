@@ -2,8 +2,20 @@
 内容生成智能体
 负责根据大纲章节生成具体的报告内容
 """
-from typing import Dict, List
-from utils.llm_client import LLMClient
+import asyncio
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from utils.llm_client import LLMClient, raise_if_retryable
+from utils.llm_cache import CachedLLMClient
+from utils.retry import is_retryable
+
+logger = logging.getLogger(__name__)
+
+# 连续空白字符、句号及其后的空白
+_WS = re.compile(r'\s+')
+_SENT_END = re.compile(r'。\s*')
 
 class ContentAgent:
     """
@@ -16,6 +28,9 @@ class ContentAgent:
     4. 可读性：确保内容易于理解和阅读
     """
     
+    # 固定的实例属性：省去每个实例的 __dict__，拼错属性名时直接报错
+    __slots__ = ('llm_client', 'agent_name', 'writing_style', 'target_length')
+    
     def __init__(self, llm_client: LLMClient):
         """
         初始化内容生成智能体
@@ -23,7 +38,7 @@ class ContentAgent:
         Args:
             llm_client: 大语言模型客户端
         """
-        self.llm_client = llm_client
+        self.llm_client = CachedLLMClient.wrap(llm_client)  # 缓存重复的提示词
         self.agent_name = "ContentAgent"
         self.writing_style = "professional"  # 写作风格
         self.target_length = 500  # 每个章节的目标字数
@@ -31,7 +46,8 @@ class ContentAgent:
     def generate_section_content(self, 
                                 section_title: str, 
                                 topic: str, 
-                                context: Dict = None) -> str:
+                                context: Dict = None,
+                                system_prompt: Optional[str] = None) -> str:
         """
         生成单个章节的内容
         
@@ -39,6 +55,7 @@ class ContentAgent:
             section_title: 章节标题
             topic: 报告主题
             context: 上下文信息（包括其他章节的信息）
+            system_prompt: 可选的系统提示词（同一报告的所有章节相同，见 agents.prompts）
             
         Returns:
             生成的章节内容
@@ -55,51 +72,130 @@ class ContentAgent:
         
         try:
             # 生成内容
-            content = self.llm_client.generate_text(prompt, max_tokens=1200)
+            content = self.llm_client.generate_text(prompt, max_tokens=1200, system_prompt=system_prompt)
             
             # 后处理内容
             processed_content = self._post_process_content(content, section_title)
             
-            print(f"[{self.agent_name}] 已生成章节 '{section_title}' 的内容 ({len(processed_content)}字符)")
+            logger.info("[%s] 已生成章节 '%s' 的内容 (%s字符)", self.agent_name, section_title, len(processed_content))
+            return processed_content
+            
+        except Exception as e:
+            logger.warning("[%s] 章节 '%s' 内容生成失败: %s", self.agent_name, section_title, e)
+            return self._generate_fallback_content(section_title, topic)
+    
+    async def a_generate_section_content(self, 
+                                         section_title: str, 
+                                         topic: str, 
+                                         context: Dict = None,
+                                         on_token: Optional[Callable[[str, str], None]] = None,
+                                         system_prompt: Optional[str] = None) -> str:
+        """
+        异步生成单个章节的内容（与 generate_section_content 的结果一致）
+        
+        Args:
+            section_title: 章节标题
+            topic: 报告主题
+            context: 上下文信息（包括其他章节的信息）
+            on_token: 可选的回调 on_token(章节标题, 新增文本)；提供时以流式方式生成，
+                每收到一段输出就立即回调
+            system_prompt: 可选的系统提示词（同一报告的所有章节相同，见 agents.prompts）
+            
+        Returns:
+            生成的章节内容
+            
+        Raises:
+            暂时性错误（限流、超时、连接失败、5xx）直接抛出，由调用方决定是否重试；
+            已经通过 on_token 输出部分内容后出错时不再抛出（重试会重复输出），返回备用内容
+        """
+        
+        prompt = self._build_content_prompt(section_title, topic, context)
+        chunks = []
+        
+        try:
+            if on_token is None:
+                content = await self.llm_client.agenerate_text(prompt, max_tokens=1200, system_prompt=system_prompt)
+                raise_if_retryable(content)
+            else:
+                async for chunk in self.llm_client.astream_text(prompt, max_tokens=1200, system_prompt=system_prompt):
+                    if not chunks:
+                        raise_if_retryable(chunk)
+                    on_token(section_title, chunk)
+                    chunks.append(chunk)
+                content = "".join(chunks)
+            processed_content = self._post_process_content(content, section_title)
+            
+            logger.info("[%s] 已生成章节 '%s' 的内容 (%s字符)", self.agent_name, section_title, len(processed_content))
             return processed_content
             
         except Exception as e:
-            print(f"[{self.agent_name}] 章节 '{section_title}' 内容生成失败: {e}")
+            if not chunks and is_retryable(e):
+                raise
+            logger.warning("[%s] 章节 '%s' 内容生成失败: %s", self.agent_name, section_title, e)
             return self._generate_fallback_content(section_title, topic)
     
     def generate_all_sections(self, 
                             outline: List[str], 
-                            topic: str) -> Dict[str, str]:
+                            topic: str,
+                            max_workers: Optional[int] = None) -> Dict[str, str]:
         """
         生成所有章节的内容
         
         Args:
             outline: 报告大纲
             topic: 报告主题
+            max_workers: 并发生成的最大线程数（默认 min(8, 章节数)）
             
         Returns:
             包含所有章节内容的字典
             
         为什么需要批量生成：
-        1. 效率：减少重复的上下文建立
-        2. 一致性：在同一个会话中生成，保持风格一致
-        3. 优化：可以考虑章节间的关联性
+        1. 效率：各章节的LLM调用相互独立，并行发出可以重叠网络等待
+        2. 一致性：所有章节共享同一份大纲上下文，保持风格一致
+        3. 有序性：结果按大纲顺序返回，与串行生成保持一致
         """
-        sections_content = {}
-        context = {"topic": topic, "outline": outline, "generated_sections": {}}
+        if not outline:
+            return {}
         
-        for i, section_title in enumerate(outline):
-            print(f"[{self.agent_name}] 正在生成第 {i+1}/{len(outline)} 个章节: {section_title}")
-            
-            # 更新上下文
-            context["current_section_index"] = i
-            context["generated_sections"] = sections_content
+        workers = max_workers or min(8, len(outline))
+        logger.info("[%s] 正在并行生成 %s 个章节（%s 个线程）", self.agent_name, len(outline), workers)
+        
+        # 每个章节使用独立的上下文快照（只依赖大纲，不依赖其他章节的生成结果）
+        contexts = [
+            {"topic": topic, "outline": outline, "generated_sections": {}, "current_section_index": i}
+            for i in range(len(outline))
+        ]
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            contents = list(executor.map(
+                self.generate_section_content, outline, [topic] * len(outline), contexts
+            ))
+        
+        return dict(zip(outline, contents))
+    
+    async def a_generate_all_sections(self, outline: List[str], topic: str) -> Dict[str, str]:
+        """
+        异步生成所有章节的内容：各章节请求在同一事件循环中用 asyncio.gather 同时发出
+        
+        Args:
+            outline: 报告大纲
+            topic: 报告主题
             
-            # 生成内容
-            content = self.generate_section_content(section_title, topic, context)
-            sections_content[section_title] = content
+        Returns:
+            包含所有章节内容的字典（按大纲顺序）
+        """
+        if not outline:
+            return {}
         
-        return sections_content
+        logger.info("[%s] 正在异步生成 %s 个章节", self.agent_name, len(outline))
+        contents = await asyncio.gather(*(
+            self.a_generate_section_content(
+                section, topic,
+                {"topic": topic, "outline": outline, "generated_sections": {}, "current_section_index": i}
+            )
+            for i, section in enumerate(outline)
+        ))
+        return dict(zip(outline, contents))
     
     def _build_content_prompt(self, 
                             section_title: str, 
@@ -115,8 +211,12 @@ class ContentAgent:
         4. 结构化：生成结构清晰的内容
         """
         
-        base_prompt = f"""
-请为报告主题 "{topic}" 撰写章节 "{section_title}" 的详细内容。
+        # 静态前缀（写作要求 + 不带标记的完整大纲）对同一报告的所有章节完全相同，
+        # 放在提示词开头，便于LLM服务端的前缀缓存命中；随章节变化的内容放在末尾
+        outline = context.get("outline", []) if context else []
+        
+        prompt = f"""
+请为报告主题 "{topic}" 撰写其中一个章节的详细内容。
 
 要求：
 1. 内容要专业、准确、有深度
@@ -127,35 +227,37 @@ class ContentAgent:
 
 """
         
-        # 添加上下文信息
-        if context:
-            outline = context.get("outline", [])
-            current_index = context.get("current_section_index", 0)
-            
-            if outline:
-                base_prompt += f"\n整个报告的大纲结构：\n"
-                for i, section in enumerate(outline):
-                    marker = " (当前章节)" if i == current_index else ""
-                    base_prompt += f"{i+1}. {section}{marker}\n"
-            
-            # 添加已生成章节的信息
-            generated_sections = context.get("generated_sections", {})
-            if generated_sections:
-                base_prompt += f"\n已生成的章节概要：\n"
-                for title, content in generated_sections.items():
-                    summary = content[:100] + "..." if len(content) > 100 else content
-                    base_prompt += f"- {title}: {summary}\n"
+        if outline:
+            prompt += "\n整个报告的大纲结构：\n"
+            prompt += "".join(f"{i+1}. {section}\n" for i, section in enumerate(outline))
         
         # 添加特定的写作指导
-        base_prompt += f"""
+        prompt += """
 请确保这个章节与整个报告的主题和其他章节保持一致。
 内容应该有理有据，如果涉及数据或统计，请说明数据来源的重要性。
 请用中文撰写，语言要专业但易懂。
-
+"""
+        
+        # 以下为随章节变化的动态部分
+        if context and outline:
+            current_index = context.get("current_section_index", 0)
+            prompt += f"\n当前章节：{current_index + 1}. {section_title}\n"
+        else:
+            prompt += f"\n当前章节：{section_title}\n"
+        
+        # 添加已生成章节的信息
+        generated_sections = context.get("generated_sections", {}) if context else {}
+        if generated_sections:
+            prompt += "\n已生成的章节概要：\n"
+            for title, content in generated_sections.items():
+                summary = content[:100] + "..." if len(content) > 100 else content
+                prompt += f"- {title}: {summary}\n"
+        
+        prompt += """
 章节内容：
 """
         
-        return base_prompt
+        return prompt
     
     def _post_process_content(self, content: str, section_title: str) -> str:
         """
@@ -169,11 +271,10 @@ class ContentAgent:
         """
         
         # 移除多余的空白字符
-        content = ' '.join(content.split())
+        content = _WS.sub(' ', content)
         
-        # 确保段落分隔
-        content = content.replace('。', '。\n\n')
-        content = '\n\n'.join(paragraph.strip() for paragraph in content.split('\n\n') if paragraph.strip())
+        # 确保段落分隔（句号后的空白一并吸收，不会产生空段落）
+        content = _SENT_END.sub('。\n\n', content).strip()
         
         # 添加章节标识（如果需要）
         if not content.startswith(section_title):
@@ -181,9 +282,9 @@ class ContentAgent:
         
         # 长度检查和调整
         if len(content) < self.target_length * 0.5:
-            print(f"[{self.agent_name}] 警告：章节 '{section_title}' 内容较短")
+            logger.warning("[%s] 章节 '%s' 内容较短", self.agent_name, section_title)
         elif len(content) > self.target_length * 2:
-            print(f"[{self.agent_name}] 警告：章节 '{section_title}' 内容较长")
+            logger.warning("[%s] 章节 '%s' 内容较长", self.agent_name, section_title)
         
         return content
     
@@ -243,7 +344,7 @@ class ContentAgent:
             enhanced_content = self.llm_client.generate_text(prompt, max_tokens=1500)
             return enhanced_content
         except Exception as e:
-            print(f"[{self.agent_name}] 内容增强失败: {e}")
+            logger.warning("[%s] 内容增强失败: %s", self.agent_name, e)
             return content  # 返回原始内容
     
     def generate_content(self, section_title: str, report_type: str = "research") -> str:
@@ -2,8 +2,89 @@
 目录生成智能体
 负责根据主题生成报告的大纲结构
 """
-from typing import List, Dict
-from utils.llm_client import LLMClient
+import logging
+import re
+from typing import List, Dict, Iterator
+from utils.llm_client import LLMClient, raise_if_retryable
+from utils.llm_cache import CachedLLMClient
+from utils.retry import is_retryable
+from .prompts import PROMPT_TEMPLATES
+
+logger = logging.getLogger(__name__)
+
+# 大纲行首的编号和列表符号（如 "1. "、"2) "、"3、"、"- "）
+_OUTLINE_PREFIX = re.compile(r'^[\s\d\.\-\)、]+')
+
+# 引言类和结论类章节的关键词
+_INTRO_KWS = ('引言', '概述', '导论')
+_CONC_KWS = ('结论', '总结', '展望')
+
+# 不同类型报告的大纲提示模板
+_TEMPLATES = {
+    "research": """
+请为研究报告主题 "{topic}" 生成一个详细的大纲。
+报告应包含以下几个部分，请生成具体的章节标题：
+
+要求：
+1. 包含引言、文献综述、方法论、分析、结论等部分
+2. 每个章节标题要具体明确
+3. 逻辑结构清晰，层次分明
+4. 适合学术研究报告的风格
+
+请以数字列表的形式输出，每行一个章节标题。
+""",
+    
+    "business": """
+请为商业报告主题 "{topic}" 生成一个专业的大纲。
+报告应适合商业环境，包含以下方面：
+
+要求：
+1. 包含执行摘要、市场分析、竞争分析、策略建议等
+2. 每个章节要对决策者有价值
+3. 结构要便于快速阅读和理解
+4. 包含数据分析和可行性分析
+
+请以数字列表的形式输出，每行一个章节标题。
+""",
+    
+    "technical": """
+请为技术报告主题 "{topic}" 生成一个详细的大纲。
+报告应适合技术人员阅读：
+
+要求：
+1. 包含技术背景、架构设计、实现方案、测试验证等
+2. 每个章节要有技术深度
+3. 包含技术细节和最佳实践
+4. 便于技术团队理解和实施
+
+请以数字列表的形式输出，每行一个章节标题。
+""",
+    
+    "academic": """
+请为学术论文主题 "{topic}" 生成一个规范的大纲。
+论文应符合学术写作标准：
+
+要求：
+1. 包含摘要、引言、相关工作、方法、实验、结论等
+2. 符合学术论文的标准结构
+3. 每个部分要有学术价值
+4. 适合期刊或会议发表
+
+请以数字列表的形式输出，每行一个章节标题。
+"""
+}
+
+# 默认大纲：前几章以主题为前缀，最后一章固定
+_DEFAULT_OUTLINE_SUFFIXES = (
+    "概述",
+    "的背景与意义",
+    "的现状分析",
+    "的关键技术/方法",
+    "的应用案例",
+    "面临的挑战",
+    "的发展趋势",
+)
+_DEFAULT_OUTLINE_TAIL = "结论与建议"
 
 class OutlineAgent:
     """
@@ -16,6 +97,9 @@ class OutlineAgent:
     4. 可定制：支持不同类型报告的目录模板
     """
     
+    # 固定的实例属性：省去每个实例的 __dict__，拼错属性名时直接报错
+    __slots__ = ('llm_client', 'agent_name')
+    
     def __init__(self, llm_client: LLMClient):
         """
         初始化目录生成智能体
@@ -23,7 +107,7 @@ class OutlineAgent:
         Args:
             llm_client: 大语言模型客户端
         """
-        self.llm_client = llm_client
+        self.llm_client = CachedLLMClient.wrap(llm_client)  # 缓存重复的提示词
         self.agent_name = "OutlineAgent"
     
     def generate_outline(self, topic: str, report_type: str = "research") -> List[str]:
@@ -44,28 +128,94 @@ class OutlineAgent:
         4. 一致性：确保报告的逻辑一致性和完整性
         """
         
-        # 根据报告类型选择不同的提示模板
-        prompt_template = self._get_prompt_template(report_type)
-        prompt = prompt_template.format(topic=topic)
-        
         try:
-            # 调用LLM生成大纲
-            response = self.llm_client.generate_text(prompt, max_tokens=800)
-            
-            # 解析和清理大纲
-            outline = self._parse_outline(response)
+            # 流式生成并逐行解析大纲
+            outline = list(self.generate_outline_streaming(topic, report_type))
             
             # 验证大纲质量
             validated_outline = self._validate_outline(outline, topic)
             
-            print(f"[{self.agent_name}] 已为主题 '{topic}' 生成 {len(validated_outline)} 个章节的大纲")
+            logger.info("[%s] 已为主题 '%s' 生成 %s 个章节的大纲", self.agent_name, topic, len(validated_outline))
             return validated_outline
             
         except Exception as e:
-            print(f"[{self.agent_name}] 大纲生成失败: {e}")
+            logger.warning("[%s] 大纲生成失败: %s", self.agent_name, e)
             # 返回默认大纲作为备选方案
             return self._get_default_outline(topic)
     
+    async def a_generate_outline(self, topic: str, report_type: str = "research") -> List[str]:
+        """
+        异步生成报告大纲（与 generate_outline 的结果一致）
+        
+        Args:
+            topic: 报告主题
+            report_type: 报告类型 (research, business, technical, academic)
+            
+        Returns:
+            大纲列表
+            
+        Raises:
+            暂时性错误（限流、超时、连接失败、5xx）直接抛出，由调用方决定是否重试；
+            其他错误返回默认大纲
+        """
+        
+        try:
+            prompt = self._get_prompt_template(report_type).format(topic=topic)
+            response = await self.llm_client.agenerate_text(
+                prompt, max_tokens=800, system_prompt=self._get_system_prompt(report_type)
+            )
+            raise_if_retryable(response)
+            
+            validated_outline = self._validate_outline(self._parse_outline(response), topic)
+            
+            logger.info("[%s] 已为主题 '%s' 生成 %s 个章节的大纲", self.agent_name, topic, len(validated_outline))
+            return validated_outline
+            
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            logger.warning("[%s] 大纲生成失败: %s", self.agent_name, e)
+            return self._get_default_outline(topic)
+    
+    def generate_outline_streaming(self, topic: str, report_type: str = "research") -> Iterator[str]:
+        """
+        流式生成报告大纲，每解析出一个章节标题就立即产出
+        
+        Args:
+            topic: 报告主题
+            report_type: 报告类型 (research, business, technical, academic)
+            
+        Returns:
+            章节标题的迭代器（未经验证，最多10个）
+            
+        为什么需要流式生成：
+        1. 降低延迟：第一个章节标题在LLM输出完整大纲之前即可使用
+        2. 流水线：下游可以提前开始处理已确定的章节
+        """
+        
+        # 根据报告类型选择不同的提示模板
+        prompt_template = self._get_prompt_template(report_type)
+        prompt = prompt_template.format(topic=topic)
+        
+        buffer = ""
+        count = 0
+        system_prompt = self._get_system_prompt(report_type)
+        for chunk in self.llm_client.stream_text(prompt, max_tokens=800, system_prompt=system_prompt):
+            buffer += chunk
+            *lines, buffer = buffer.split('\n')
+            for line in lines:
+                section = _OUTLINE_PREFIX.sub('', line).strip()
+                if len(section) > 3:
+                    yield section
+                    count += 1
+                    if count >= 10:  # 限制章节数量，避免过长
+                        return
+        
+        # 最后一行可能没有换行符
+        section = _OUTLINE_PREFIX.sub('', buffer).strip()
+        if len(section) > 3:
+            yield section
+    
     def _get_prompt_template(self, report_type: str) -> str:
         """
         获取不同类型报告的提示模板
@@ -75,61 +225,11 @@ class OutlineAgent:
         2. 针对性：提高生成内容的相关性和专业性
         3. 标准化：符合行业标准和读者期望
         """
-        templates = {
-            "research": """
-请为研究报告主题 "{topic}" 生成一个详细的大纲。
-报告应包含以下几个部分，请生成具体的章节标题：
-
-要求：
-1. 包含引言、文献综述、方法论、分析、结论等部分
-2. 每个章节标题要具体明确
-3. 逻辑结构清晰，层次分明
-4. 适合学术研究报告的风格
-
-请以数字列表的形式输出，每行一个章节标题。
-""",
-            
-            "business": """
-请为商业报告主题 "{topic}" 生成一个专业的大纲。
-报告应适合商业环境，包含以下方面：
-
-要求：
-1. 包含执行摘要、市场分析、竞争分析、策略建议等
-2. 每个章节要对决策者有价值
-3. 结构要便于快速阅读和理解
-4. 包含数据分析和可行性分析
-
-请以数字列表的形式输出，每行一个章节标题。
-""",
-            
-            "technical": """
-请为技术报告主题 "{topic}" 生成一个详细的大纲。
-报告应适合技术人员阅读：
-
-要求：
-1. 包含技术背景、架构设计、实现方案、测试验证等
-2. 每个章节要有技术深度
-3. 包含技术细节和最佳实践
-4. 便于技术团队理解和实施
-
-请以数字列表的形式输出，每行一个章节标题。
-""",
-            
-            "academic": """
-请为学术论文主题 "{topic}" 生成一个规范的大纲。
-论文应符合学术写作标准：
-
-要求：
-1. 包含摘要、引言、相关工作、方法、实验、结论等
-2. 符合学术论文的标准结构
-3. 每个部分要有学术价值
-4. 适合期刊或会议发表
-
-请以数字列表的形式输出，每行一个章节标题。
-"""
-        }
-        
-        return templates.get(report_type, templates["research"])
+        return _TEMPLATES.get(report_type, _TEMPLATES["research"])
+    
+    def _get_system_prompt(self, report_type: str) -> str:
+        """获取该报告类型预先生成的系统提示词"""
+        return PROMPT_TEMPLATES.get(("outline", report_type), PROMPT_TEMPLATES[("outline", "research")])
     
     def _parse_outline(self, response: str) -> List[str]:
         """
@@ -140,19 +240,11 @@ class OutlineAgent:
         2. 数据清理：移除无关内容和格式字符
         3. 结构化：转换为程序可处理的数据结构
         """
-        lines = response.strip().split('\n')
-        outline = []
-        
-        for line in lines:
-            line = line.strip()
-            # 移除编号和特殊字符
-            line = line.lstrip('0123456789.- ')
-            
-            # 过滤空行和无效内容
-            if line and len(line) > 3:
-                outline.append(line)
-        
-        return outline[:10]  # 限制章节数量，避免过长
+        # 移除编号和特殊字符，过滤空行和无效内容，并限制章节数量避免过长
+        return [
+            section for section in (_OUTLINE_PREFIX.sub('', line).strip() for line in response.splitlines())
+            if len(section) > 3
+        ][:10]
     
     def _validate_outline(self, outline: List[str], topic: str) -> List[str]:
         """
@@ -166,14 +258,18 @@ class OutlineAgent:
         """
         # 基本验证
         if len(outline) < 3:
-            print(f"[{self.agent_name}] 警告：大纲章节过少，补充默认章节")
+            logger.warning("[%s] 大纲章节过少，补充默认章节", self.agent_name)
             return self._get_default_outline(topic)
         
-        # 检查是否包含基本部分
-        has_intro = any('引言' in section or '概述' in section or '导论' in section 
-                       for section in outline)
-        has_conclusion = any('结论' in section or '总结' in section or '展望' in section 
-                           for section in outline)
+        # 检查是否包含基本部分（单次遍历，两类都找到后提前结束）
+        has_intro = has_conclusion = False
+        for section in outline:
+            if not has_intro and any(kw in section for kw in _INTRO_KWS):
+                has_intro = True
+            if not has_conclusion and any(kw in section for kw in _CONC_KWS):
+                has_conclusion = True
+            if has_intro and has_conclusion:
+                break
         
         if not has_intro:
             outline.insert(0, f"{topic}概述")
@@ -191,16 +287,7 @@ class OutlineAgent:
         2. 基础结构：提供最基本的报告结构
         3. 可靠性：确保系统的鲁棒性
         """
-        return [
-            f"{topic}概述",
-            f"{topic}的背景与意义",
-            f"{topic}的现状分析",
-            f"{topic}的关键技术/方法",
-            f"{topic}的应用案例",
-            f"{topic}面临的挑战",
-            f"{topic}的发展趋势",
-            "结论与建议"
-        ]
+        return [f"{topic}{suffix}" for suffix in _DEFAULT_OUTLINE_SUFFIXES] + [_DEFAULT_OUTLINE_TAIL]
     
     def refine_outline(self, outline: List[str], feedback: str) -> List[str]:
         """
@@ -226,8 +313,8 @@ class OutlineAgent:
         try:
             response = self.llm_client.generate_text(prompt, max_tokens=600)
             refined_outline = self._parse_outline(response)
-            print(f"[{self.agent_name}] 已根据反馈优化大纲")
+            logger.info("[%s] 已根据反馈优化大纲", self.agent_name)
             return refined_outline
         except Exception as e:
-            print(f"[{self.agent_name}] 大纲优化失败: {e}")
+            logger.warning("[%s] 大纲优化失败: %s", self.agent_name, e)
             return outline  # 返回原始大纲
@@ -2,9 +2,133 @@
 润色智能体
 负责对生成的内容进行语言优化和质量提升
 """
+import asyncio
+import io
+import json
+import logging
 import re
-from typing import Dict, List
-from utils.llm_client import LLMClient
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+from utils.llm_client import LLMClient, DegradedText, DEFAULT_MAX_OUTPUT_TOKENS, raise_if_retryable
+from utils.llm_cache import CachedLLMClient
+from utils.retry import is_retryable
+
+logger = logging.getLogger(__name__)
+
+# 连续空白字符
+_WS = re.compile(r'\s+')
+# 英文标点到中文全角标点的一对一映射（str.translate 单次C级扫描完成）
+_PUNCT_TABLE = str.maketrans({',': '，', '.': '。', ';': '；', ':': '：'})
+# 中文标点后的多余空白
+_PUNCT_WS = re.compile(r'([，。；：])\s+')
+
+# 句子（以句号结尾，或段落末尾没有句号的部分）
+_SENTENCE = re.compile(r'[^。]*。|[^。]+')
+
+def _clean_text(text: str) -> str:
+    """
+    基本文本清理（模块级纯函数，可在线程/进程工作单元中直接调用）
+    
+    规范化空白和标点，并在句号后分段
+    """
+    # 规范化空白字符
+    text = _WS.sub(' ', text)
+    
+    # 规范化标点符号，并移除标点后的空白
+    text = text.translate(_PUNCT_TABLE)
+    text = _PUNCT_WS.sub(r'\1', text)
+    
+    # 句号后分段，移除首尾空白
+    return text.replace('。', '。\n\n').strip()
+
+def _estimate_output_tokens(title: str, content: str) -> int:
+    """
+    粗略估计一个章节的润色结果（JSON中的一项）占用的输出token数
+    
+    中文约每字一个token，英文更少；按字符数计并留出JSON转义和标题的余量，宁可高估
+    """
+    return int((len(title) + len(content)) * 1.2) + 16
+
+def _repack_paragraph(paragraph: str, hard_limit: int = 500, soft_limit: int = 300) -> List[str]:
+    """
+    将过长的段落按句子重新组合为约 soft_limit 字的段落
+    
+    纯函数，只依赖参数，可在任意线程中调用，也便于单独测试
+    """
+    if len(paragraph) <= hard_limit:
+        return [paragraph]
+    
+    result = []
+    buf = []
+    buf_len = 0
+    for match in _SENTENCE.finditer(paragraph):
+        sentence = match.group(0)
+        if buf_len + len(sentence) > soft_limit and buf:
+            result.append(''.join(buf).strip())
+            buf = []
+            buf_len = 0
+        buf.append(sentence)
+        buf_len += len(sentence)
+    
+    tail = ''.join(buf).strip()
+    if tail:
+        result.append(tail)
+    return result
+
+# 润色指令（作为系统提示词，所有章节完全相同，便于LLM服务端的前缀缓存命中）
+STATIC_POLISH_INSTRUCTIONS = """你是一个专业的报告润色助手。请对用户提供的文本进行专业润色。
+
+润色要求：
+1. 语言流畅性：确保语句通顺、表达自然
+2. 逻辑清晰性：优化逻辑结构，增强条理性
+3. 专业术语：使用准确的专业术语
+4. 句式多样性：避免句式单调，增加表达层次
+5. 表达准确性：确保意思准确，避免歧义
+
+请保持原有的主要观点和信息不变，只优化表达方式，直接输出润色后的文本。"""
+
+# 用户消息模板（动态内容，放在系统提示词之后）
+_POLISH_TITLE_LINE = "章节：{section_title}\n\n"
+_POLISH_PAYLOAD_HEAD = "原始文本：\n"
+_POLISH_PAYLOAD_TAIL = "\n\n润色后的文本：\n"
+
+_CONTEXT_POLISH_PAYLOAD = """章节标题：{section_title}
+{context_summary}
+
+待润色内容：
+{content}
+
+润色后的内容：
+"""
+
+STYLE_SHEET_INSTRUCTIONS = """请阅读用户提供的报告片段，用8条简短的要点概括其写作风格，
+包括语气、用词、句式、段落组织、专业术语使用和数据表述方式等。
+只输出要点列表，每行一条，不要复述原文内容。"""
+
+STATIC_CONTEXT_POLISH_INSTRUCTIONS = """你是一个专业的报告润色助手。请润色用户提供的章节内容，确保与整个报告的风格保持一致。
+
+润色要求：
+1. 保持与前面章节的风格一致
+2. 确保章节间的过渡自然
+3. 避免与前面内容重复
+4. 提升语言的专业性和可读性
+5. 保持逻辑结构清晰
+
+请直接输出润色后的内容。"""
+
+STATIC_BATCH_POLISH_INSTRUCTIONS = """你是一个专业的报告润色助手。用户会提供一个JSON对象，键为章节标题，值为该章节的待润色内容。
+
+润色要求：
+1. 各章节风格保持一致，符合用户给出的写作风格要求
+2. 确保章节间的过渡自然，避免内容重复
+3. 提升语言的专业性和可读性
+4. 保持原有的主要观点、信息和逻辑结构不变
+
+请只输出一个JSON对象：键与输入的章节标题完全相同，值为润色后的章节内容。"""
+
+_BATCH_POLISH_PAYLOAD = """{style_summary}待润色章节（JSON）：
+{sections_json}
+"""
 
 class PolishAgent:
     """
@@ -24,7 +148,7 @@ class PolishAgent:
         Args:
             llm_client: 大语言模型客户端
         """
-        self.llm_client = llm_client
+        self.llm_client = CachedLLMClient.wrap(llm_client)  # 缓存重复的提示词
         self.agent_name = "PolishAgent"
         self.polish_aspects = [
             "语言流畅性",
@@ -59,25 +183,30 @@ class PolishAgent:
             # 基本文本清理
             cleaned_content = self._basic_text_cleaning(content)
             
-            # LLM润色
-            polished_content = self._llm_polish(cleaned_content, section_title)
+            # 快速路径：过短或只有一句话的内容没有润色价值，省去一次LLM调用
+            quality = self.check_text_quality(cleaned_content)
+            if quality["length"] < 80 or quality["sentence_count"] < 2:
+                return cleaned_content
             
-            # 后处理
-            final_content = self._post_polish_processing(polished_content)
+            # LLM润色（流式接收，每收到一个完整段落即进行后处理）
+            final_content = self._llm_polish(cleaned_content, section_title)
             
-            print(f"[{self.agent_name}] 已润色内容 ({len(content)} -> {len(final_content)} 字符)")
+            logger.info("[%s] 已润色内容 (%s -> %s 字符)", self.agent_name, len(content), len(final_content))
             return final_content
             
         except Exception as e:
-            print(f"[{self.agent_name}] 润色失败: {e}")
+            logger.warning("[%s] 润色失败: %s", self.agent_name, e)
             return self._basic_text_cleaning(content)  # 至少进行基本清理
     
-    def polish_full_report(self, sections_content: Dict[str, str]) -> Dict[str, str]:
+    def polish_full_report(self, 
+                           sections_content: Dict[str, str],
+                           max_workers: Optional[int] = None) -> Dict[str, str]:
         """
         润色整个报告
         
         Args:
             sections_content: 包含所有章节内容的字典
+            max_workers: 并发润色的最大线程数（默认 min(8, 章节数)）
             
         Returns:
             润色后的章节内容字典
@@ -87,25 +216,230 @@ class PolishAgent:
         2. 章节衔接：优化章节间的过渡和衔接
         3. 重复检查：避免内容重复
         4. 整体优化：从整体角度优化报告质量
+        
+        首个章节润色完成后作为风格参考，其余章节的润色请求同时发出，
+        总耗时接近两个章节的润色时间，而不是所有章节之和
+        """
+        
+        if not sections_content:
+            return {}
+        
+        titles = list(sections_content.keys())
+        workers = max_workers or min(8, len(titles))
+        logger.info("[%s] 正在并行润色 %s 个章节（%s 个线程）", self.agent_name, len(titles), workers)
+        
+        # 先润色第一个章节，作为全局风格参考；其余章节只依赖这份参考，可以完全并行
+        first_polished = self._clean_and_polish(
+            sections_content[titles[0]], titles[0], {"all_sections": titles, "current_index": 0}
+        )
+        # 从首个章节提炼一份简短的风格说明，其余章节的提示词逐字节复用同一份
+        style_sheet = self._extract_style_sheet(first_polished) if len(titles) > 1 else ""
+        
+        contexts = [
+            {"all_sections": titles, "current_index": i, "style_sheet": style_sheet}
+            for i in range(1, len(titles))
+        ]
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            polished = list(executor.map(
+                self._clean_and_polish, list(sections_content.values())[1:], titles[1:], contexts
+            ))
+        
+        return dict(zip(titles, [first_polished] + polished))
+    
+    async def polish_full_report_async(self, sections_content: Dict[str, str]) -> Dict[str, str]:
+        """
+        异步润色整个报告（与 polish_full_report 的结果一致）
+        
+        Args:
+            sections_content: 包含所有章节内容的字典
+            
+        Returns:
+            润色后的章节内容字典
+            
+        为什么需要异步版本：
+        1. 连接复用：所有章节的请求共享同一个 httpx.AsyncClient，只建立一次TCP/TLS连接
+        2. 轻量并发：用 asyncio.gather 同时发出请求，不占用额外线程
+        """
+        
+        if not sections_content:
+            return {}
+        
+        titles = list(sections_content.keys())
+        logger.info("[%s] 正在异步润色 %s 个章节", self.agent_name, len(titles))
+        
+        first_polished = await self.a_polish_section(
+            sections_content[titles[0]], titles[0], {"all_sections": titles, "current_index": 0}
+        )
+        style_sheet = await self.a_extract_style_sheet(first_polished) if len(titles) > 1 else ""
+        
+        polished = await asyncio.gather(*(
+            self.a_polish_section(
+                sections_content[title], title,
+                {"all_sections": titles, "current_index": i, "style_sheet": style_sheet}
+            )
+            for i, title in enumerate(titles[1:], start=1)
+        ))
+        
+        return dict(zip(titles, [first_polished] + list(polished)))
+    
+    async def a_polish_batch(self, 
+                             sections: Dict[str, str], 
+                             max_chars: int = 12000,
+                             style_sheet: str = "",
+                             run: Optional[Callable[[Callable[[], Awaitable]], Awaitable]] = None,
+                             all_sections: Optional[List[str]] = None,
+                             max_output_tokens: Optional[int] = None) -> Dict[str, str]:
         """
+        批量润色多个章节：多个章节打包进一次请求，要求模型以JSON对象返回
         
-        polished_sections = {}
-        total_sections = len(sections_content)
+        Args:
+            sections: 章节标题到内容的字典
+            max_chars: 每个请求中章节内容的总字符数上限（单个超长章节单独成批）
+            style_sheet: 写作风格说明（通常从首个润色完成的章节提炼）
+            run: 可选的请求执行函数 run(coro_fn)，每个LLM请求（批量请求和逐章节重试）各调用一次，
+                调用方可以在其中施加并发上限、超时和重试；暂时性错误会以异常形式抛给它
+            all_sections: 完整的章节标题列表（逐章节重试时用于确定章节位置），默认为 sections 的标题
+            max_output_tokens: 单个请求的输出token上限，默认使用模型的上限（见 LLMClient.max_output_tokens）
+            
+        Returns:
+            润色后的章节内容字典（与输入顺序一致）；润色失败的章节保留基本清理后的内容
+            
+        为什么需要批量润色：
+        1. 效率：N个章节只需少量请求，排队、鉴权和连接开销不随章节数增长
+        2. 成本：润色指令和风格说明每批只发送一次
+        3. 容错：返回结果缺失或格式错误的章节单独重新润色，个别请求失败不影响其他章节
+        """
         
-        for i, (section_title, content) in enumerate(sections_content.items()):
-            print(f"[{self.agent_name}] 正在润色第 {i+1}/{total_sections} 个章节: {section_title}")
+        if not sections:
+            return {}
+        
+        titles = list(sections.keys())
+        cleaned = {title: _clean_text(content) for title, content in sections.items()}
+        budget = max_output_tokens or getattr(self.llm_client, "max_output_tokens", DEFAULT_MAX_OUTPUT_TOKENS)
+        
+        # 按原顺序装箱：每批的内容总长度不超过 max_chars，预计的输出token数不超过 budget
+        # （润色结果与原文长度相当，整批结果必须在一次回复内返回）
+        batches, batch, batch_len, batch_tokens = [], [], 0, 0
+        for title in titles:
+            size = len(cleaned[title])
+            tokens = _estimate_output_tokens(title, cleaned[title])
+            if batch and (batch_len + size > max_chars or batch_tokens + tokens > budget):
+                batches.append(batch)
+                batch, batch_len, batch_tokens = [], 0, 0
+            batch.append(title)
+            batch_len += size
+            batch_tokens += tokens
+        batches.append(batch)
+        
+        logger.info("[%s] 正在批量润色 %s 个章节（%s 个请求）", self.agent_name, len(titles), len(batches))
+        
+        run = run or (lambda coro_fn: coro_fn())
+        results = await asyncio.gather(*(
+            self._apolish_batch(batch, cleaned, all_sections or titles, style_sheet, run, budget) for batch in batches
+        ), return_exceptions=True)
+        
+        polished = {}
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException):
+                logger.warning("[%s] %s 个章节润色失败，保留原内容: %r", self.agent_name, len(batch), result)
+                continue
+            polished.update(result)
+        return {title: polished.get(title, cleaned[title]) for title in titles}
+    
+    async def _apolish_batch(self, 
+                             batch: List[str], 
+                             cleaned: Dict[str, str], 
+                             all_sections: List[str],
+                             style_sheet: str,
+                             run: Callable[[Callable[[], Awaitable]], Awaitable],
+                             max_output_tokens: int) -> Dict[str, str]:
+        """润色一批章节；解析失败或缺失的章节逐个重新润色，仍失败的章节不出现在结果中"""
+        
+        polished = {}
+        if len(batch) > 1:
+            style_summary = f"报告的写作风格要求：\n{style_sheet}\n\n" if style_sheet else ""
+            prompt = _BATCH_POLISH_PAYLOAD.format(
+                style_summary=style_summary,
+                sections_json=json.dumps({title: cleaned[title] for title in batch}, ensure_ascii=False, indent=2)
+            )
             
-            # 提供上下文信息
-            context = {
-                "all_sections": list(sections_content.keys()),
-                "current_index": i,
-                "previous_content": list(polished_sections.values())
-            }
+            async def request() -> str:
+                response = await self.llm_client.agenerate_text(
+                    prompt,
+                    max_tokens=min(1500 * len(batch), max_output_tokens),
+                    system_prompt=STATIC_BATCH_POLISH_INSTRUCTIONS,
+                    response_format={"type": "json_object"}
+                )
+                raise_if_retryable(response)
+                return response
             
-            polished_content = self._polish_with_context(content, section_title, context)
-            polished_sections[section_title] = polished_content
+            try:
+                response = await run(request)
+                parsed = json.loads(response)
+                if not isinstance(parsed, dict):
+                    raise ValueError("批量润色结果不是JSON对象")
+                polished = {
+                    title: parsed[title] for title in batch
+                    if isinstance(parsed.get(title), str) and parsed[title].strip()
+                }
+            except Exception as e:
+                logger.warning("[%s] 批量润色结果解析失败，改为逐章节润色: %s", self.agent_name, e)
+        
+        retry = [title for title in batch if title not in polished]
+        if retry:
+            retried = await asyncio.gather(*(
+                run(lambda title=title: self._apolish_single(
+                    cleaned[title], title,
+                    {"all_sections": all_sections, "current_index": all_sections.index(title), "style_sheet": style_sheet}
+                ))
+                for title in retry
+            ), return_exceptions=True)
+            for title, result in zip(retry, retried):
+                if isinstance(result, BaseException):
+                    logger.warning("[%s] 章节 '%s' 润色失败，保留原内容: %r", self.agent_name, title, result)
+                else:
+                    polished[title] = result
+        return polished
+    
+    async def _apolish_single(self, content: str, section_title: str, context: Dict) -> str:
+        """润色已清理的单个章节；暂时性错误导致的降级结果重新抛出该错误"""
+        polished = await self._apolish_with_context(content, section_title, context)
+        raise_if_retryable(polished)
+        return polished
+    
+    async def a_extract_style_sheet(self, polished_text: str) -> str:
+        """
+        异步提炼写作风格说明（与 _extract_style_sheet 的结果一致）
+        
+        暂时性错误（限流、超时、连接失败、5xx）会重新抛出，由调用方决定是否重试；
+        其他错误退回使用原文开头作为风格参考
+        """
+        try:
+            style_sheet = await self.llm_client.agenerate_text(
+                polished_text[:2000], max_tokens=300, system_prompt=STYLE_SHEET_INSTRUCTIONS
+            )
+            raise_if_retryable(style_sheet)
+            if style_sheet and not isinstance(style_sheet, DegradedText):
+                return style_sheet.strip()
+        except Exception as e:
+            if is_retryable(e):
+                raise
+            logger.warning("[%s] 风格提炼失败: %s", self.agent_name, e)
+        
+        return polished_text[:300]
+    
+    async def a_polish_section(self, content: str, section_title: str, context: Dict) -> str:
+        """
+        异步润色单个章节：先做基本清理，再基于上下文润色
         
-        return polished_sections
+        暂时性错误（限流、超时、连接失败、5xx）导致的降级结果会重新抛出该错误，由调用方决定是否重试
+        """
+        return await self._apolish_single(_clean_text(content), section_title, context)
+    
+    def _clean_and_polish(self, content: str, section_title: str, context: Dict) -> str:
+        """线程工作单元：先做基本清理，再基于上下文润色（清理与其他章节的LLM请求重叠进行）"""
+        return self._polish_with_context(_clean_text(content), section_title, context)
     
     def _basic_text_cleaning(self, text: str) -> str:
         """
@@ -117,28 +451,19 @@ class PolishAgent:
         3. 预处理：为LLM润色做准备
         """
         
-        # 规范化空白字符
-        text = re.sub(r'\s+', ' ', text)
-        
-        # 规范化标点符号
-        text = re.sub(r'[，,]\s*', '，', text)
-        text = re.sub(r'[。.]\s*', '。', text)
-        text = re.sub(r'[；;]\s*', '；', text)
-        text = re.sub(r'[：:]\s*', '：', text)
-        
-        # 规范化段落分隔
-        text = re.sub(r'。\s*', '。\n\n', text)
-        text = re.sub(r'\n\s*\n', '\n\n', text)
-        
-        # 移除首尾空白
-        text = text.strip()
-        
-        return text
+        return _clean_text(text)
     
     def _llm_polish(self, content: str, section_title: str = None) -> str:
         """
         使用LLM进行内容润色
         
+        Args:
+            content: 待润色内容（已完成基本清理）
+            section_title: 章节标题
+        
+        Returns:
+            已完成后处理（见 _post_polish_processing）的润色文本
+        
         为什么使用LLM润色：
         1. 智能化：理解语义，进行智能优化
         2. 全面性：同时处理多个润色维度
@@ -146,28 +471,49 @@ class PolishAgent:
         4. 专业性：提升专业表达水准
         """
         
-        context_info = f"（章节：{section_title}）" if section_title else ""
+        # 固定指令作为系统提示词，动态内容放在用户消息中，保证提示词前缀逐字节一致
+        buf = io.StringIO()
+        if section_title:
+            buf.write(_POLISH_TITLE_LINE.format(section_title=section_title))
+        buf.write(_POLISH_PAYLOAD_HEAD)
+        buf.write(content)
+        buf.write(_POLISH_PAYLOAD_TAIL)
+        
+        # 流式接收润色结果：后处理与生成重叠进行，不必等待完整响应
+        processed = []
+        pending = ""
+        for chunk in self.llm_client.stream_text(
+            buf.getvalue(), max_tokens=1500, system_prompt=STATIC_POLISH_INSTRUCTIONS
+        ):
+            pending += chunk
+            if '\n\n' in pending:
+                *paragraphs, pending = pending.split('\n\n')
+                for paragraph in paragraphs:
+                    processed.extend(self._post_process_paragraph(paragraph))
+        processed.extend(self._post_process_paragraph(pending))
+        
+        return '\n\n'.join(processed)
+    
+    def _extract_style_sheet(self, polished_text: str) -> str:
+        """
+        从已润色的文本中提炼写作风格说明
         
-        prompt = f"""
-请对以下文本进行专业润色{context_info}：
-
-原始文本：
-{content}
-
-润色要求：
-1. 语言流畅性：确保语句通顺、表达自然
-2. 逻辑清晰性：优化逻辑结构，增强条理性
-3. 专业术语：使用准确的专业术语
-4. 句式多样性：避免句式单调，增加表达层次
-5. 表达准确性：确保意思准确，避免歧义
-
-请保持原有的主要观点和信息不变，只优化表达方式。
-
-润色后的文本：
-"""
+        为什么需要风格说明：
+        1. 成本：几条要点代替大段原文，每个章节的提示词更短
+        2. 缓存友好：所有章节复用同一份说明，提示词内容逐字节一致
+        3. 一致性：明确的风格要点比原文片段更容易被模型遵循
+        """
+        try:
+            style_sheet = self.llm_client.generate_text(
+                polished_text[:2000], max_tokens=300, system_prompt=STYLE_SHEET_INSTRUCTIONS
+            )
+            if style_sheet and not isinstance(style_sheet, DegradedText):
+                return style_sheet.strip()
+        except Exception as e:
+            logger.warning("[%s] 风格提炼失败: %s", self.agent_name, e)
         
-        polished_text = self.llm_client.generate_text(prompt, max_tokens=1500)
-        return polished_text
+        # 提炼失败时退回使用原文开头作为风格参考
+        return polished_text[:300]
     
     def _polish_with_context(self, content: str, section_title: str, context: Dict) -> str:
         """
@@ -179,35 +525,37 @@ class PolishAgent:
         3. 避免重复：检查并避免内容重复
         """
         
-        previous_sections = context.get("previous_content", [])
-        context_summary = ""
+        prompt = self._build_context_polish_prompt(content, section_title, context)
         
-        if previous_sections:
-            # 生成前面章节的简要概述
-            recent_content = " ".join(previous_sections[-2:])[:300]  # 最近两个章节的前300字符
-            context_summary = f"\n\n前面章节的风格参考：\n{recent_content}..."
+        polished_text = self.llm_client.generate_text(
+            prompt, max_tokens=1500, system_prompt=STATIC_CONTEXT_POLISH_INSTRUCTIONS
+        )
+        return polished_text
+    
+    async def _apolish_with_context(self, content: str, section_title: str, context: Dict) -> str:
+        """基于上下文进行润色（异步版本）"""
+        prompt = self._build_context_polish_prompt(content, section_title, context)
+        return await self.llm_client.agenerate_text(
+            prompt, max_tokens=1500, system_prompt=STATIC_CONTEXT_POLISH_INSTRUCTIONS
+        )
+    
+    def _build_context_polish_prompt(self, content: str, section_title: str, context: Dict) -> str:
+        """
+        构建上下文润色的提示词（同步、异步路径共用）
         
-        prompt = f"""
-请润色以下章节内容，确保与整个报告的风格保持一致：
-
-章节标题：{section_title}
-{context_summary}
-
-待润色内容：
-{content}
-
-润色要求：
-1. 保持与前面章节的风格一致
-2. 确保章节间的过渡自然
-3. 避免与前面内容重复
-4. 提升语言的专业性和可读性
-5. 保持逻辑结构清晰
-
-润色后的内容：
-"""
+        风格说明只从 context["style_sheet"] 读取（没有时不带风格要求），
+        不保存在实例上：同一个智能体可能同时为多份报告润色
+        """
+        style_sheet = context.get("style_sheet", "")
+        context_summary = ""
         
-        polished_text = self.llm_client.generate_text(prompt, max_tokens=1500)
-        return polished_text
+        if style_sheet:
+            # 使用从首个章节提炼的风格说明作为全局风格参考
+            context_summary = f"\n\n报告的写作风格要求：\n{style_sheet}"
+        
+        return _CONTEXT_POLISH_PAYLOAD.format(
+            section_title=section_title, context_summary=context_summary, content=content
+        )
     
     def _post_polish_processing(self, text: str) -> str:
         """
@@ -219,31 +567,21 @@ class PolishAgent:
         3. 错误修正：修正可能的润色错误
         """
         
-        # 再次进行基本清理
+        return '\n\n'.join(self._post_process_paragraph(text))
+    
+    def _post_process_paragraph(self, text: str) -> List[str]:
+        """对一段文本进行基本清理，并拆分过长的段落，返回处理后的段落列表"""
+        
+        # 基本清理
         text = self._basic_text_cleaning(text)
+        if not text:
+            return []
         
         # 检查段落长度，避免过长的段落
-        paragraphs = text.split('\n\n')
         processed_paragraphs = []
-        
-        for paragraph in paragraphs:
-            if len(paragraph) > 500:  # 如果段落太长，尝试分割
-                sentences = paragraph.split('。')
-                current_para = ""
-                
-                for sentence in sentences:
-                    if len(current_para + sentence) > 300 and current_para:
-                        processed_paragraphs.append(current_para.strip() + '。')
-                        current_para = sentence
-                    else:
-                        current_para += sentence + '。'
-                
-                if current_para.strip():
-                    processed_paragraphs.append(current_para.strip())
-            else:
-                processed_paragraphs.append(paragraph)
-        
-        return '\n\n'.join(processed_paragraphs)
+        for paragraph in text.split('\n\n'):
+            processed_paragraphs.extend(_repack_paragraph(paragraph))
+        return processed_paragraphs
     
     def check_text_quality(self, text: str) -> Dict[str, any]:
         """
@@ -255,15 +593,18 @@ class PolishAgent:
         3. 改进建议：提供改进方向
         """
         
+        # 段落只切分一次；句末标点用C实现的 str.count 统计，不生成匹配列表
+        parts = text.split('\n\n')
+        
         quality_metrics = {
             "length": len(text),
-            "paragraph_count": len(text.split('\n\n')),
+            "paragraph_count": len(parts),
             "avg_paragraph_length": 0,
-            "sentence_count": len(re.findall(r'[。！？]', text)),
+            "sentence_count": text.count('。') + text.count('！') + text.count('？'),
             "issues": []
         }
         
-        paragraphs = [p for p in text.split('\n\n') if p.strip()]
+        paragraphs = [p for p in parts if p.strip()]
         if paragraphs:
             quality_metrics["avg_paragraph_length"] = sum(len(p) for p in paragraphs) / len(paragraphs)
         
@@ -0,0 +1,50 @@
+"""
+系统提示词模板
+按 (智能体, 报告类型) 预先生成固定的系统提示词
+"""
+from typing import Dict, Tuple
+
+# 支持的报告类型及其写作定位
+_REPORT_TYPES = {
+    "research": ("研究报告", "行文严谨客观，论证有理有据，区分事实与推断"),
+    "business": ("商业报告", "面向决策者，结论先行，突出数据支撑、可行性和行动建议"),
+    "technical": ("技术报告", "面向技术人员，注重技术细节、实现方案和可实施性"),
+    "academic": ("学术论文", "符合学术写作规范，术语准确，表述严谨，避免口语化"),
+}
+
+# 各智能体的角色与输出要求（{name} 为报告类型名称，{style} 为写作定位）
+_AGENT_TEMPLATES = {
+    "outline": """你是一名资深的{name}策划人，负责为{name}设计章节结构。
+写作定位：{style}。
+只输出章节标题列表，每行一个，不要输出其他说明。""",
+
+    "content": """你是一名资深的{name}撰稿人，负责撰写{name}中的单个章节。
+写作定位：{style}。
+请严格按照用户给出的要求撰写，直接输出章节正文，不要重复章节标题。""",
+
+    "chart": """你是一名数据可视化专家，负责从{name}的章节内容中识别适合用图表呈现的信息。
+只输出用户要求的JSON，不要输出其他说明。""",
+}
+
+# 导入时一次性渲染全部组合；同一报告内所有调用使用完全相同的系统提示词，
+# 便于LLM服务端的前缀缓存命中
+PROMPT_TEMPLATES: Dict[Tuple[str, str], str] = {
+    (agent, report_type): template.format(name=name, style=style)
+    for agent, template in _AGENT_TEMPLATES.items()
+    for report_type, (name, style) in _REPORT_TYPES.items()
+}
+
+
+def system_prompts(report_type: str) -> Dict[str, str]:
+    """
+    获取某一报告类型下各智能体的系统提示词
+
+    Args:
+        report_type: 报告类型，未知类型按 research 处理
+
+    Returns:
+        智能体名称（outline/content/chart）到系统提示词的映射
+    """
+    if report_type not in _REPORT_TYPES:
+        report_type = "research"
+    return {agent: PROMPT_TEMPLATES[(agent, report_type)] for agent in _AGENT_TEMPLATES}
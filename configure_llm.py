@@ -6,8 +6,64 @@
 import os
 import sys
 import json
+import socket
+from urllib.parse import urlparse
+from datetime import datetime
 from pathlib import Path
 
+def _load_env(path: Path) -> dict:
+    """读取 .env 配置文件为字典（跳过注释行；文件不存在时返回空字典）"""
+    if not path.exists():
+        return {}
+    return {
+        key.strip(): value.strip()
+        for line in path.read_text(encoding='utf-8').splitlines()
+        if '=' in line and not line.startswith('#')
+        for key, value in [line.split('=', 1)]
+    }
+
+# vLLM探测使用的HTTP会话（保持连接复用）和成功探测结果的缓存
+_session = None
+_probe_cache = {}
+
+def _probe_vllm(base_url: str, timeout: float = 2) -> tuple:
+    """
+    探测vLLM服务是否可用
+    
+    Returns:
+        (alive, models)：服务是否可用、可用模型ID列表
+    
+    为什么这样探测：
+    1. 快速失败：先做TCP连接检查，服务未启动时1秒内返回，不必等待HTTP超时
+    2. 连接复用：使用同一个Session，后续请求复用keep-alive连接
+    3. 避免重复：同一地址探测成功后缓存结果，配置和测试流程共用一次探测
+    """
+    global _session
+    base_url = base_url.rstrip('/')
+    if base_url in _probe_cache:
+        return _probe_cache[base_url]
+    
+    parsed = urlparse(base_url)
+    port = parsed.port or (443 if parsed.scheme == 'https' else 80)
+    try:
+        socket.create_connection((parsed.hostname, port), timeout=1).close()
+    except (OSError, TypeError):
+        return False, []
+    
+    try:
+        import requests
+        if _session is None:
+            _session = requests.Session()
+        response = _session.get(f"{base_url}/v1/models", timeout=timeout)
+        if response.status_code != 200:
+            return False, []
+        models = [model['id'] for model in response.json().get('data') or []]
+    except Exception:
+        return False, []
+    
+    _probe_cache[base_url] = (True, models)
+    return True, models
+
 def main():
     print("🔧 多智能体报告生成系统 - 大模型配置助手")
     print("=" * 60)
@@ -18,12 +74,11 @@ def main():
     
     if has_config:
         print("✅ 发现现有配置文件 .env")
-        with open(env_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            if 'OPENAI_API_KEY' in content and content.split('OPENAI_API_KEY=')[1].split('\n')[0].strip() != 'your_openai_api_key_here':
-                print("✅ OpenAI API密钥已配置")
-            else:
-                print("⚠️  OpenAI API密钥未配置")
+        api_key = _load_env(env_file).get('OPENAI_API_KEY', '')
+        if api_key and api_key != 'your_openai_api_key_here':
+            print("✅ OpenAI API密钥已配置")
+        else:
+            print("⚠️  OpenAI API密钥未配置")
     else:
         print("⚠️  未发现配置文件")
     
@@ -34,22 +89,25 @@ def main():
     print("4. 测试当前配置")
     print("5. 退出")
     
-    choice = input("\n请输入选择 (1-5): ").strip()
-    
-    if choice == '1':
-        configure_openai()
-    elif choice == '2':
-        configure_vllm()
-    elif choice == '3':
-        configure_demo()
-    elif choice == '4':
-        test_configuration()
-    elif choice == '5':
-        print("👋 配置已取消")
-        sys.exit(0)
-    else:
-        print("❌ 无效选择")
-        main()
+    # 输入无效时只重新提示选择，不重复打印横幅和读取配置
+    while True:
+        choice = input("\n请输入选择 (1-5): ").strip()
+        
+        if choice == '1':
+            configure_openai()
+        elif choice == '2':
+            configure_vllm()
+        elif choice == '3':
+            configure_demo()
+        elif choice == '4':
+            test_configuration()
+        elif choice == '5':
+            print("👋 配置已取消")
+            sys.exit(0)
+        else:
+            print("❌ 无效选择")
+            continue
+        break
 
 def configure_openai():
     """配置OpenAI API"""
@@ -62,11 +120,11 @@ def configure_openai():
     print("3. 复制密钥并粘贴到下面")
     print("4. 确保账户有足够余额")
     
-    api_key = input("\n请输入您的OpenAI API密钥: ").strip()
-    
-    if not api_key or api_key == 'your_openai_api_key_here':
+    while True:
+        api_key = input("\n请输入您的OpenAI API密钥: ").strip()
+        if api_key and api_key != 'your_openai_api_key_here':
+            break
         print("❌ API密钥不能为空")
-        return configure_openai()
     
     # 可选：自定义base URL
     print("\n🌐 API Base URL配置 (可选)")
@@ -135,24 +193,16 @@ def configure_vllm():
         print(f"📁 模型路径: {deepseek_path}")
     
     # 检查是否已有vLLM服务运行
-    try:
-        import requests
-        response = requests.get("http://localhost:8000/v1/models", timeout=5)
-        if response.status_code == 200:
-            models = response.json()
-            print("✅ 检测到运行中的vLLM服务")
-            if 'data' in models and models['data']:
-                available_models = [model['id'] for model in models['data']]
-                print(f"📋 可用模型: {', '.join(available_models)}")
-                default_model = available_models[0] if available_models else ("deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B" if deepseek_available else "Qwen/Qwen2-7B-Instruct")
-            else:
-                default_model = "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B" if deepseek_available else "Qwen/Qwen2-7B-Instruct"
-        else:
-            print("⚠️  vLLM服务未运行或响应异常")
-            default_model = "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B" if deepseek_available else "Qwen/Qwen2-7B-Instruct"
-    except:
+    fallback_model = "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B" if deepseek_available else "Qwen/Qwen2-7B-Instruct"
+    alive, available_models = _probe_vllm("http://localhost:8000")
+    if alive:
+        print("✅ 检测到运行中的vLLM服务")
+        if available_models:
+            print(f"📋 可用模型: {', '.join(available_models)}")
+        default_model = available_models[0] if available_models else fallback_model
+    else:
         print("⚠️  vLLM服务未运行")
-        default_model = "deepseek-ai/DeepSeek-R1-Distill-Qwen-1.5B" if deepseek_available else "Qwen/Qwen2-7B-Instruct"
+        default_model = fallback_model
     
     print(f"\n🔧 配置vLLM连接")
     
@@ -228,7 +278,8 @@ def configure_vllm():
     print(f"如果vLLM服务未运行，请执行:")
     print(f"./start_vllm.sh")
     print(f"或手动启动:")
-    print(f"python -m vllm.entrypoints.openai.api_server --model {model_name} --host 0.0.0.0 --port 8000")
+    print(f"python -m vllm.entrypoints.openai.api_server --model {model_name} --host 0.0.0.0 --port 8000 --enable-prefix-caching")
+    print(f"💡 --enable-prefix-caching 让各章节共享的系统提示词前缀只需计算一次")
 
 def configure_demo():
     """配置演示模式"""
@@ -261,12 +312,7 @@ def test_configuration():
         print("❌ 未找到配置文件 .env")
         return
     
-    config = {}
-    with open(env_file, 'r', encoding='utf-8') as f:
-        for line in f:
-            if '=' in line and not line.startswith('#'):
-                key, value = line.strip().split('=', 1)
-                config[key] = value
+    config = _load_env(env_file)
     
     model_type = config.get('DEFAULT_MODEL_TYPE', '')
     
@@ -323,10 +369,15 @@ def test_vllm_connection(base_url, model_name=None):
     try:
         import requests
         
+        # 先探测服务（未启动时立即失败，不必依次等待各个请求超时）
+        alive, available_models = _probe_vllm(base_url)
+        if not alive:
+            raise requests.exceptions.ConnectionError(base_url)
+        
         # 1. 测试健康检查
         print("1️⃣ 检查服务状态...")
         try:
-            health_response = requests.get(f"{base_url}/health", timeout=5)
+            health_response = _session.get(f"{base_url}/health", timeout=5)
             if health_response.status_code == 200:
                 print("✅ 服务健康状态正常")
             else:
@@ -336,12 +387,7 @@ def test_vllm_connection(base_url, model_name=None):
         
         # 2. 获取模型列表
         print("2️⃣ 获取可用模型...")
-        models_response = requests.get(f"{base_url}/v1/models", timeout=5)
-        models_response.raise_for_status()
-        
-        models_data = models_response.json()
-        if 'data' in models_data and models_data['data']:
-            available_models = [model['id'] for model in models_data['data']]
+        if available_models:
             print(f"✅ 发现 {len(available_models)} 个可用模型:")
             for model in available_models:
                 print(f"   - {model}")
@@ -366,7 +412,7 @@ def test_vllm_connection(base_url, model_name=None):
             "temperature": 0.7
         }
         
-        chat_response = requests.post(
+        chat_response = _session.post(
             f"{base_url}/v1/chat/completions",
             json=chat_data,
             timeout=30
@@ -419,13 +465,7 @@ def write_env_config(config):
     env_file = Path('.env')
     
     # 读取现有配置
-    existing_config = {}
-    if env_file.exists():
-        with open(env_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                if '=' in line and not line.startswith('#'):
-                    key, value = line.strip().split('=', 1)
-                    existing_config[key] = value
+    existing_config = _load_env(env_file)
     
     # 更新配置
     existing_config.update(config)
@@ -433,7 +473,7 @@ def write_env_config(config):
     # 写入配置
     with open(env_file, 'w', encoding='utf-8') as f:
         f.write("# 多智能体报告生成系统配置文件\n")
-        f.write(f"# 生成时间: {os.popen('date').read().strip()}\n\n")
+        f.write(f"# 生成时间: {datetime.now().isoformat(timespec='seconds')}\n\n")
         
         for key, value in existing_config.items():
             f.write(f"{key}={value}\n")
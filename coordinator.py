@@ -3,11 +3,52 @@
 负责协调各个智能体的工作，管理整个报告生成流程
 """
 import os
+import re
+import json
+import hashlib
+import unicodedata
 import time
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from agents import OutlineAgent, ContentAgent, PolishAgent, ChartAgent
-from utils import LLMClient, ReportFormatter
+from agents.prompts import system_prompts
+from utils import LLMClient, CachedLLMClient, ReportFormatter
+from utils.file_writer import atomic_write, atomic_write_chunks, read_digest
+from utils.retry import hedged, with_retry
+
+# 协调器的进度日志由根日志器的处理器输出（见 utils.logger.LogManager：经队列由后台线程写出，
+# 事件循环中的协程不会因输出而阻塞）；宿主程序可以按常规方式接管
+logger = logging.getLogger(__name__)
+
+# 每个协调器保留的最近日志条数
+_LOG_HISTORY = 1000
+
+# 章节标题中的空白字符
+_TITLE_WS = re.compile(r"\s+")
+
+
+def _normalize_title(title: str) -> str:
+    """章节标题的规范形式：全角/半角统一、去掉空白、忽略大小写"""
+    return _TITLE_WS.sub("", unicodedata.normalize("NFKC", title)).lower()
+
+# 日志时间戳缓存 (秒, 格式化结果)：同一秒内的日志复用上一次的格式化结果
+_timestamp_cache = (0, "")
+
+
+def _log_timestamp() -> str:
+    """当前时间的 "%Y-%m-%d %H:%M:%S" 字符串，每秒最多格式化一次（可在任意线程中调用）"""
+    global _timestamp_cache
+    sec = int(time.time())
+    cached = _timestamp_cache  # 读取一次，避免与其他线程的更新交错
+    if cached[0] == sec:
+        return cached[1]
+    formatted = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(sec))
+    _timestamp_cache = (sec, formatted)
+    return formatted
 
 class ReportCoordinator:
     """
@@ -26,7 +67,11 @@ class ReportCoordinator:
                  model_name: str = "gpt-3.5-turbo",
                  api_key: Optional[str] = None,
                  base_url: Optional[str] = None,
-                 output_dir: str = "output"):
+                 output_dir: str = "output",
+                 cache: str = "exact",
+                 model_map: Optional[Dict[str, Tuple[str, str]]] = None,
+                 batch_polish: bool = False,
+                 cache_sampled: bool = False):
         """
         初始化报告协调器
         
@@ -36,21 +81,53 @@ class ReportCoordinator:
             api_key: API密钥
             base_url: API基础URL
             output_dir: 输出目录
+            cache: LLM响应缓存模式：exact（精确匹配，默认）、semantic（精确匹配 + 语义相似）、off（关闭）
+            model_map: 按任务指定模型，键为 outline、content、polish、chart_analysis，
+                值为 (model_type, model_name)；未指定的任务使用 model_type/model_name。
+                大纲和图表需求识别这类简单任务可以交给更小、更快的模型
+            batch_polish: 是否批量润色：所有章节生成完成后，多个章节合并为一次请求润色；
+                请求数更少，但不再与内容生成流水线并行
+            cache_sampled: 是否缓存 temperature > 0 的采样结果（模型温度默认大于0）；
+                默认不缓存，同一提示词的采样输出本应不同；需要可复现的重复运行时再开启
         """
+        if cache not in ("exact", "semantic", "off"):
+            raise ValueError(f"不支持的缓存模式: {cache}")
         
-        # 初始化LLM客户端
-        self.llm_client = LLMClient(
-            model_type=model_type,
-            model_name=model_name,
-            api_key=api_key,
-            base_url=base_url
-        )
+        # 初始化LLM客户端（包装缓存层）；每个不同的模型只创建一个客户端，使用同一模型的智能体共享缓存
+        model_map = model_map or {}
+        self._llm_clients = {}
+        
+        def client_for(task: str) -> CachedLLMClient:
+            task_type, task_name = model_map.get(task, (model_type, model_name))
+            if (task_type, task_name) not in self._llm_clients:
+                # API密钥和地址只用于与主模型同类型的服务，其他类型从环境变量读取
+                same_type = task_type == model_type
+                self._llm_clients[(task_type, task_name)] = CachedLLMClient(
+                    LLMClient(
+                        model_type=task_type,
+                        model_name=task_name,
+                        api_key=api_key if same_type else None,
+                        base_url=base_url if same_type else None
+                    ),
+                    semantic=(cache == "semantic"),
+                    enabled=(cache != "off"),
+                    cache_sampled=cache_sampled
+                )
+            return self._llm_clients[(task_type, task_name)]
+        
+        self.llm_client = client_for("content")
+        # 各任务实际使用的模型（参与断点续跑的输入摘要）
+        self._model_routes = {
+            task: model_map.get(task, (model_type, model_name))
+            for task in ("outline", "content", "polish", "chart_analysis")
+        }
         
         # 初始化各个智能体
-        self.outline_agent = OutlineAgent(self.llm_client)
+        self.outline_agent = OutlineAgent(client_for("outline"))
         self.content_agent = ContentAgent(self.llm_client)
-        self.polish_agent = PolishAgent(self.llm_client)
-        self.chart_agent = ChartAgent(self.llm_client, os.path.join(output_dir, "charts"))
+        self.polish_agent = PolishAgent(client_for("polish"))
+        # 图表智能体只在需求识别时调用LLM，绘图在本地完成
+        self.chart_agent = ChartAgent(client_for("chart_analysis"), os.path.join(output_dir, "charts"))
         
         # 初始化报告格式化器
         self.formatter = ReportFormatter()
@@ -59,6 +136,25 @@ class ReportCoordinator:
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
         
+        # 同时进行的LLM请求上限（遵守服务商的速率限制）；
+        # 信号量在每次生成时于当前事件循环中创建
+        self.llm_concurrency = int(os.getenv("LLM_CONCURRENCY", "8"))
+        self._llm_sem = None
+        # 当前报告类型下各智能体的系统提示词（预先生成，同一报告的所有调用共享，便于前缀缓存命中）
+        self._sys_prompts = system_prompts("research")
+        # 单次智能体调用的超时秒数和最多尝试次数（超时、限流等暂时性错误会退避重试）
+        self.llm_timeout = float(os.getenv("LLM_TIMEOUT", "120"))
+        self.llm_attempts = int(os.getenv("LLM_ATTEMPTS", "3"))
+        # 大纲请求的对冲等待秒数（该模型还没有耗时统计时使用）
+        self.hedge_delay = float(os.getenv("LLM_HEDGE_DELAY", "10"))
+        self.batch_polish = batch_polish
+        
+        # 图表渲染进程池：matplotlib绘图是CPU密集操作，多核时各图表在独立进程中并行渲染；
+        # 只有一个工作进程时不创建进程池，直接在线程中串行绘制（工作进程在首次提交任务时才启动，
+        # 用完后调用 close() 或使用 with 语句释放）
+        chart_processes = int(os.getenv("CHART_PROCESSES", min(8, os.cpu_count() or 1)))
+        self._chart_pool = ProcessPoolExecutor(max_workers=chart_processes) if chart_processes > 1 else None
+        
         # 工作流程状态
         self.workflow_status = {
             "outline_generated": False,
@@ -68,20 +164,68 @@ class ReportCoordinator:
             "report_formatted": False
         }
         
-        self.generation_log = []
+        self.generation_log = deque(maxlen=_LOG_HISTORY)
         
-        print(f"[ReportCoordinator] 系统初始化完成")
-        print(f"[ReportCoordinator] 模型: {model_type}/{model_name}")
-        print(f"[ReportCoordinator] 输出目录: {output_dir}")
+        logger.info("系统初始化完成")
+        logger.info("模型: %s/%s", model_type, model_name)
+        for task, (task_type, task_name) in model_map.items():
+            logger.info("%s 模型: %s/%s", task, task_type, task_name)
+        logger.info("输出目录: %s", output_dir)
+        logger.info("响应缓存: %s", cache)
+    
+    def close(self) -> None:
+        """
+        释放协调器持有的资源：图表渲染进程池和各LLM客户端的同步HTTP连接池（可重复调用）
+        
+        关闭后仍可继续生成报告，图表改为在线程中串行绘制
+        """
+        if self._chart_pool is not None:
+            self._chart_pool.shutdown()
+            self._chart_pool = None
+        for client in self._llm_clients.values():
+            client.close()
+    
+    def __enter__(self) -> "ReportCoordinator":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
     
     def generate_report(self, 
                        topic: str, 
                        report_type: str = "research",
                        enable_charts: bool = True,
                        enable_polish: bool = True,
-                       output_formats: List[str] = ["markdown", "docx"]) -> Dict:
+                       output_formats: List[str] = ["markdown", "docx"],
+                       on_token: Optional[Callable[[str, str], None]] = None,
+                       resume: bool = False) -> Dict:
+        """
+        生成完整报告（同步入口，参数和返回值见 agenerate_report）
+        
+        在新的事件循环中运行 agenerate_report，结束后关闭该循环上的HTTP连接池
+        """
+        
+        async def run() -> Dict:
+            try:
+                return await self.agenerate_report(
+                    topic, report_type, enable_charts, enable_polish, output_formats, on_token, resume
+                )
+            finally:
+                for client in self._llm_clients.values():
+                    await client.aclose()
+        
+        return asyncio.run(run())
+    
+    async def agenerate_report(self, 
+                               topic: str, 
+                               report_type: str = "research",
+                               enable_charts: bool = True,
+                               enable_polish: bool = True,
+                               output_formats: List[str] = ["markdown", "docx"],
+                               on_token: Optional[Callable[[str, str], None]] = None,
+                               resume: bool = False) -> Dict:
         """
-        生成完整报告
+        异步生成完整报告
         
         Args:
             topic: 报告主题
@@ -89,6 +233,10 @@ class ReportCoordinator:
             enable_charts: 是否生成图表
             enable_polish: 是否进行润色
             output_formats: 输出格式列表
+            on_token: 可选的回调 on_token(章节标题, 新增文本)；章节内容以流式方式生成，
+                调用方可以在章节完成前看到输出（回调在事件循环中执行，应尽快返回）
+            resume: 断点续跑：相同输入（主题、选项和模型）已经成功生成过报告，且输出文件未被改动时，
+                直接返回已保存的结果，不再调用LLM
             
         Returns:
             包含报告内容和元数据的字典
@@ -99,32 +247,63 @@ class ReportCoordinator:
         3. 可配置：用户可以选择启用/禁用某些功能
         4. 可追踪：记录每个步骤的执行状态
         5. 容错性：单个步骤失败不会影响整个流程
+        6. 并发：各步骤内部的LLM调用在事件循环中同时发出，
+           耗时接近单次调用而不是所有调用之和
         """
         
         start_time = time.time()
+        self._llm_sem = asyncio.Semaphore(self.llm_concurrency)
+        self._sys_prompts = system_prompts(report_type)
         self._log(f"开始生成报告: {topic}")
         
+        inputs_hash = self._inputs_hash(topic, report_type, enable_charts, enable_polish, output_formats)
+        if resume:
+            previous = self._load_manifest(inputs_hash)
+            if previous is not None:
+                self._log("输入与已保存的报告一致，直接复用已有输出")
+                return {
+                    "status": "success",
+                    "topic": topic,
+                    "report_type": report_type,
+                    "data": previous["data"],
+                    "output_files": previous["output_files"],
+                    "resumed": True,
+                    "workflow_status": self.workflow_status,
+                    "generation_log": list(self.generation_log),
+                    "processing_time": time.time() - start_time
+                }
+        
         try:
             # 步骤1: 生成大纲
             self._log("步骤1: 生成报告大纲")
-            outline = self._generate_outline(topic, report_type)
+            outline = await self._generate_outline(topic, report_type)
             
             # 步骤2: 生成内容
             self._log("步骤2: 生成章节内容")
-            sections_content = self._generate_content(outline, topic)
             
-            # 步骤3: 润色内容（可选）
+            # 步骤3: 润色内容（可选）；每个章节生成后立即润色，与其他章节的内容生成重叠进行
             if enable_polish:
-                self._log("步骤3: 润色报告内容")
-                sections_content = self._polish_content(sections_content)
+                self._log("步骤3: 润色报告内容（与内容生成流水线并行）")
             else:
                 self._log("步骤3: 跳过润色（用户选择）")
+            # 逐章节润色时，每个章节的内容一生成就开始分析图表需求，与润色和其他章节的生成重叠进行；
+            # 不润色或批量润色时没有可重叠的润色，在内容完成后批量分析（多个章节合并为一次请求）
+            chart_specs = {} if enable_charts and enable_polish and not self.batch_polish else None
+            if enable_polish and self.batch_polish:
+                sections_content = await self._generate_content(
+                    outline, topic, on_token=on_token, chart_specs=chart_specs
+                )
+                sections_content = await self._polish_content(sections_content)
+            else:
+                sections_content = await self._generate_content(
+                    outline, topic, polish=enable_polish, on_token=on_token, chart_specs=chart_specs
+                )
             
             # 步骤4: 生成图表（可选）
             charts = {}
             if enable_charts:
                 self._log("步骤4: 分析和生成图表")
-                charts = self._generate_charts(sections_content)
+                charts = await self._generate_charts(sections_content, chart_specs)
             else:
                 self._log("步骤4: 跳过图表生成（用户选择）")
             
@@ -140,7 +319,8 @@ class ReportCoordinator:
                 "processing_time": time.time() - start_time
             }
             
-            output_files = self._format_and_save_report(report_data, output_formats)
+            output_files = await self._format_and_save_report(report_data, output_formats)
+            self._save_manifest(inputs_hash, report_data, output_files)
             
             # 生成最终报告
             final_report = {
@@ -150,7 +330,7 @@ class ReportCoordinator:
                 "data": report_data,
                 "output_files": output_files,
                 "workflow_status": self.workflow_status,
-                "generation_log": self.generation_log,
+                "generation_log": list(self.generation_log),
                 "processing_time": time.time() - start_time
             }
             
@@ -163,14 +343,173 @@ class ReportCoordinator:
                 "topic": topic,
                 "error": str(e),
                 "workflow_status": self.workflow_status,
-                "generation_log": self.generation_log,
+                "generation_log": list(self.generation_log),
                 "processing_time": time.time() - start_time
             }
             
             self._log(f"报告生成失败: {e}")
             return error_report
     
-    def _generate_outline(self, topic: str, report_type: str) -> List[str]:
+    def generate_reports_batch(self, topics: List[str], report_type: str = "research") -> str:
+        """
+        通过 OpenAI Batch API 批量生成多个主题的报告内容（只提交，不等待结果）
+        
+        Args:
+            topics: 报告主题列表
+            report_type: 报告类型 (research, business, technical, academic)
+            
+        Returns:
+            批处理任务ID，用 collect_reports_batch 取回结果
+            
+        为什么需要批处理模式：
+        1. 成本：批处理接口的价格约为在线接口的一半
+        2. 吞吐：大量章节请求由服务端统一排队，不受客户端并发和速率限制影响
+        3. 代价：结果在 24 小时内返回，只适合不需要立即拿到报告的批量任务
+        
+        大纲在提交前同步生成（请求少且短）；批处理模式下不润色、不生成图表
+        """
+        if self.llm_client.model_type != "openai":
+            raise ValueError("批处理模式只支持 openai 模型")
+        
+        topics = list(dict.fromkeys(topics))
+        self._sys_prompts = system_prompts(report_type)
+        self._log(f"批处理模式：为 {len(topics)} 个主题生成大纲")
+        
+        async def outlines() -> List[List[str]]:
+            self._llm_sem = asyncio.Semaphore(self.llm_concurrency)
+            try:
+                return await asyncio.gather(*(self._generate_outline(topic, report_type) for topic in topics))
+            finally:
+                for client in self._llm_clients.values():
+                    await client.aclose()
+        
+        reports = {}
+        lines = []
+        for topic, outline in zip(topics, asyncio.run(outlines())):
+            topic_key = hashlib.sha256(topic.encode("utf-8")).hexdigest()[:16]
+            reports[topic_key] = {"topic": topic, "report_type": report_type, "outline": outline}
+            for i, section in enumerate(outline):
+                context = {"topic": topic, "outline": outline, "generated_sections": {}, "current_section_index": i}
+                prompt = self.content_agent._build_content_prompt(section, topic, context)
+                lines.append(json.dumps({
+                    "custom_id": f"{topic_key}:{i}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": self.llm_client.model_name,
+                        "messages": self.llm_client._build_messages(prompt, self._sys_prompts["content"]),
+                        "max_tokens": 1200,
+                        "temperature": self.llm_client.temperature,
+                    },
+                }, ensure_ascii=False))
+        
+        batch_dir = os.path.join(self.output_dir, ".batches")
+        os.makedirs(batch_dir, exist_ok=True)
+        input_path = os.path.join(batch_dir, f"input_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+        atomic_write(input_path, ("\n".join(lines) + "\n").encode("utf-8"), sidecar=False)
+        
+        client = self.llm_client._get_openai_client()
+        with open(input_path, "rb") as f:
+            input_file = client.files.create(file=f, purpose="batch")
+        batch = client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        
+        # 取回结果时需要按 custom_id 把章节还原到各自的报告中
+        state = {"reports": reports, "input_file": input_path}
+        atomic_write(
+            os.path.join(batch_dir, f"{batch.id}.json"),
+            json.dumps(state, ensure_ascii=False).encode("utf-8"),
+            sidecar=False
+        )
+        self._log(f"已提交批处理任务 {batch.id}，共 {len(lines)} 个章节请求")
+        return batch.id
+    
+    def collect_reports_batch(self,
+                              batch_id: str,
+                              output_formats: List[str] = ["markdown", "docx"],
+                              wait: bool = False,
+                              poll_interval: float = 60.0) -> Optional[List[Dict]]:
+        """
+        取回批处理任务的结果，组装并保存各主题的报告
+        
+        Args:
+            batch_id: generate_reports_batch 返回的任务ID
+            output_formats: 输出格式列表
+            wait: 任务未完成时是否每隔 poll_interval 秒查询一次直到结束
+            poll_interval: 轮询间隔秒数
+            
+        Returns:
+            每个主题一份报告（结构与 generate_report 的返回值相同）；任务尚未完成时返回None
+        """
+        with open(os.path.join(self.output_dir, ".batches", f"{batch_id}.json"), "r", encoding="utf-8") as f:
+            reports = json.load(f)["reports"]
+        
+        client = self.llm_client._get_openai_client()
+        batch = client.batches.retrieve(batch_id)
+        while wait and batch.status in ("validating", "in_progress", "finalizing"):
+            time.sleep(poll_interval)
+            batch = client.batches.retrieve(batch_id)
+        if batch.status != "completed":
+            self._log(f"批处理任务 {batch_id} 状态: {batch.status}")
+            return None
+        
+        # custom_id -> 章节原始内容；失败或缺失的章节之后使用备用内容
+        outputs = {}
+        if batch.output_file_id:
+            for line in client.files.content(batch.output_file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get("response") or {}
+                if response.get("status_code") == 200:
+                    outputs[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+        
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        results = []
+        for topic_key, report in reports.items():
+            topic, outline = report["topic"], report["outline"]
+            sections_content = {}
+            for i, section in enumerate(outline):
+                content = outputs.get(f"{topic_key}:{i}")
+                if content is None:
+                    self._log(f"章节 '{section}' 没有批处理结果，使用备用内容")
+                    sections_content[section] = self.content_agent._generate_fallback_content(section, topic)
+                else:
+                    sections_content[section] = self.content_agent._post_process_content(content, section)
+            
+            report_data = {
+                "title": topic,
+                "type": report["report_type"],
+                "outline": outline,
+                "sections": sections_content,
+                "charts": {},
+                "generation_time": datetime.now().isoformat(),
+                "processing_time": 0.0
+            }
+            output_files = {}
+            for format_type in dict.fromkeys(output_formats):
+                filepath = self._save_format(format_type, report_data, f"report_{timestamp}_{topic_key[:8]}")
+                if filepath:
+                    output_files[format_type] = filepath
+            
+            results.append({
+                "status": "success",
+                "topic": topic,
+                "report_type": report["report_type"],
+                "data": report_data,
+                "output_files": output_files,
+                "batch_id": batch_id,
+                "generation_log": list(self.generation_log),
+                "processing_time": 0.0
+            })
+        
+        self._log(f"批处理任务 {batch_id} 已组装 {len(results)} 份报告")
+        return results
+    
+    async def _generate_outline(self, topic: str, report_type: str) -> List[str]:
         """
         生成报告大纲
         
@@ -180,55 +519,234 @@ class ReportCoordinator:
         3. 状态管理：更新工作流程状态
         """
         try:
-            outline = self.outline_agent.generate_outline(topic, report_type)
-            self.workflow_status["outline_generated"] = True
-            self._log(f"大纲生成成功，包含 {len(outline)} 个章节")
-            return outline
+            # 大纲位于关键路径上：请求慢于该模型的典型耗时时再发出一个相同的请求，取先完成的结果
+            delay = self.outline_agent.llm_client.latency_ewma or self.hedge_delay
+            outline = await self._call_with_retry(
+                lambda: hedged(lambda: self.outline_agent.a_generate_outline(topic, report_type), delay),
+                "大纲生成"
+            )
         except Exception as e:
-            self._log(f"大纲生成失败: {e}")
-            raise Exception(f"大纲生成失败: {e}")
+            # 重试后仍失败（如持续限流）时使用默认大纲，与智能体处理其他错误的方式一致
+            self._log(f"大纲生成失败，使用默认大纲: {e!r}")
+            outline = self.outline_agent._get_default_outline(topic)
+        self.workflow_status["outline_generated"] = True
+        self._log(f"大纲生成成功，包含 {len(outline)} 个章节")
+        return outline
     
-    def _generate_content(self, outline: List[str], topic: str) -> Dict[str, str]:
+    async def _generate_content(self, 
+                                outline: List[str], 
+                                topic: str, 
+                                polish: bool = False,
+                                on_token: Optional[Callable[[str, str], None]] = None,
+                                chart_specs: Optional[Dict[str, asyncio.Task]] = None) -> Dict[str, str]:
         """
-        生成所有章节内容
+        生成所有章节内容（可选地在同一条流水线中润色）
+        
+        chart_specs 不为None时，每个章节的原始内容生成后立即启动该章节的图表需求分析任务，
+        以章节标题为键存入 chart_specs，由 _generate_charts 汇总
         
         为什么需要协调：
         1. 进度跟踪：跟踪内容生成进度
         2. 资源管理：合理分配生成资源
         3. 错误处理：处理单个章节的生成错误
+        
+        为什么需要流水线：
+        1. 重叠：某个章节的内容生成完成后立即润色，不必等待最慢的章节
+        2. 依赖：其余章节的润色只依赖首个章节提炼的风格说明，等待这一项即可
         """
         try:
-            sections_content = self.content_agent.generate_all_sections(outline, topic)
+            loop = asyncio.get_running_loop()
+            # 首个章节润色后提炼的风格说明；其余章节的润色等待它完成
+            style_sheet = loop.create_future() if polish else None
+            
+            # 规范化后相同的标题（只有空白、大小写或全角/半角不同）只生成一次，结果复用到重复的标题
+            unique = {}   # 规范化标题 -> (大纲序号, 首次出现的标题)
+            aliases = {}  # 重复的标题 -> 首次出现的标题
+            for i, section in enumerate(outline):
+                key = _normalize_title(section)
+                if key in unique:
+                    aliases[section] = unique[key][1]
+                else:
+                    unique[key] = (i, section)
+            if aliases:
+                self._log(f"大纲中有 {len(aliases)} 个重复章节标题，复用首次出现的章节内容")
+            
+            # 各章节并发执行，信号量限制同时进行的请求数；单个章节失败不影响其他章节
+            results = await asyncio.gather(
+                *(self._a_section_pipeline(section, topic, outline, i, style_sheet, on_token, chart_specs)
+                  for i, section in unique.values()),
+                return_exceptions=True
+            )
+            
+            generated = {}
+            for (_, section), result in zip(unique.values(), results):
+                if isinstance(result, Exception):
+                    self._log(f"章节 '{section}' 生成失败，使用备用内容: {result!r}")
+                    result = self.content_agent._generate_fallback_content(section, topic)
+                generated[section] = result
+            sections_content = {section: generated[aliases.get(section, section)] for section in outline}
+            
+            if chart_specs is not None and aliases:
+                # 重复的章节与首次出现的章节内容相同，不再单独分析图表需求
+                no_charts = loop.create_future()
+                no_charts.set_result([])
+                for section in aliases:
+                    chart_specs.setdefault(section, no_charts)
+            
             self.workflow_status["content_generated"] = True
             self._log(f"内容生成成功，共 {len(sections_content)} 个章节")
+            if polish:
+                self.workflow_status["content_polished"] = True
+                self._log("内容润色完成")
             return sections_content
         except Exception as e:
             self._log(f"内容生成失败: {e}")
             raise Exception(f"内容生成失败: {e}")
     
-    def _polish_content(self, sections_content: Dict[str, str]) -> Dict[str, str]:
+    async def _a_section_pipeline(self, 
+                                  section: str, 
+                                  topic: str, 
+                                  outline: List[str], 
+                                  index: int,
+                                  style_sheet: Optional[asyncio.Future],
+                                  on_token: Optional[Callable[[str, str], None]] = None,
+                                  chart_specs: Optional[Dict[str, asyncio.Task]] = None) -> str:
         """
-        润色报告内容
+        单个章节的流水线：生成内容，启用润色时（style_sheet不为None）紧接着润色；
+        图表需求分析基于原始内容，在后台与润色同时进行
+        """
+        try:
+            content = await self._a_generate_section(section, topic, outline, index, on_token)
+            if chart_specs is not None:
+                chart_specs[section] = asyncio.ensure_future(self._a_analyze_section_charts(section, content))
+            if style_sheet is None:
+                return content
+            
+            context = {"all_sections": outline, "current_index": index}
+            if index > 0:
+                context["style_sheet"] = await style_sheet
+            polished = await self._a_polish_section(content, section, context)
+            
+            if index == 0 and len(outline) > 1:
+                style_sheet.set_result(await self._a_extract_style_sheet(polished))
+            return polished
+        finally:
+            # 首个章节失败时其余章节不带风格说明继续润色，避免一直等待
+            if index == 0 and style_sheet is not None and not style_sheet.done():
+                style_sheet.set_result("")
+    
+    async def _a_generate_section(self, 
+                                  section: str, 
+                                  topic: str, 
+                                  outline: List[str], 
+                                  index: int,
+                                  on_token: Optional[Callable[[str, str], None]] = None) -> str:
+        """在并发上限内生成单个章节的内容"""
+        context = {"topic": topic, "outline": outline, "generated_sections": {}, "current_section_index": index}
+        async with self._llm_sem:
+            return await self._call_with_retry(
+                lambda: self.content_agent.a_generate_section_content(
+                    section, topic, context, on_token, self._sys_prompts["content"]
+                ),
+                f"章节 '{section}' 内容生成"
+            )
+    
+    async def _a_polish_section(self, content: str, section: str, context: Dict) -> str:
+        """在并发上限内润色单个章节；润色失败时返回原始内容"""
+        try:
+            async with self._llm_sem:
+                return await self._call_with_retry(
+                    lambda: self.polish_agent.a_polish_section(content, section, context),
+                    f"章节 '{section}' 润色"
+                )
+        except Exception as e:
+            self._log(f"章节 '{section}' 润色失败，保留原始内容: {e!r}")
+            return content
+    
+    async def _a_extract_style_sheet(self, polished: str) -> str:
+        """在并发上限内提炼风格说明；重试后仍失败时返回空字符串，其余章节不带风格说明继续润色"""
+        try:
+            async with self._llm_sem:
+                return await self._call_with_retry(
+                    lambda: self.polish_agent.a_extract_style_sheet(polished), "风格说明提炼"
+                )
+        except Exception as e:
+            self._log(f"风格说明提炼失败，其余章节不带风格说明润色: {e!r}")
+            return ""
+    
+    async def _call_with_retry(self, coro_fn: Callable, description: str):
+        """
+        带超时和重试地调用智能体
+        
+        为什么需要超时：并发生成时总耗时取决于最慢的请求，单个挂起的请求不应拖住整个报告；
+        智能体的 a_* 方法把暂时性错误（限流、5xx、连接失败）作为异常抛出，在这里与超时一起退避重试；
+        重试的次数和原因记录在生成日志中
+        """
+        def on_retry(attempt: int, error: BaseException, delay: float):
+            self._log(f"{description}第 {attempt} 次尝试失败（{error!r}），{delay:.1f} 秒后重试")
+        
+        return await with_retry(coro_fn, attempts=self.llm_attempts, timeout=self.llm_timeout, on_retry=on_retry)
+    
+    async def _polish_content(self, sections_content: Dict[str, str]) -> Dict[str, str]:
+        """
+        批量润色报告内容
         
         为什么需要润色协调：
         1. 质量控制：确保润色质量
         2. 进度管理：管理润色进度
-        3. 一致性：保持整体润色风格一致
+        3. 一致性：首个章节单独润色并提炼风格说明，其余章节按该说明批量润色
         """
+        titles = list(sections_content.keys())
+        if not titles:
+            return sections_content
+        
+        # 先复制原始内容：任何一步失败时，已经润色完成的章节（包括首个章节）都会保留
+        polished_content = dict(sections_content)
         try:
-            polished_content = self.polish_agent.polish_full_report(sections_content)
+            polished_content[titles[0]] = await self._a_polish_section(
+                sections_content[titles[0]], titles[0], {"all_sections": titles, "current_index": 0}
+            )
+            if len(titles) > 1:
+                style_sheet = await self._a_extract_style_sheet(polished_content[titles[0]])
+                
+                async def run(coro_fn: Callable):
+                    # 批量润色中的每个请求各自占用一个并发名额，并带超时和重试
+                    async with self._llm_sem:
+                        return await self._call_with_retry(coro_fn, "批量润色请求")
+                
+                polished_content.update(await self.polish_agent.a_polish_batch(
+                    {title: sections_content[title] for title in titles[1:]},
+                    style_sheet=style_sheet, run=run, all_sections=titles
+                ))
+            
             self.workflow_status["content_polished"] = True
             self._log("内容润色完成")
-            return polished_content
         except Exception as e:
-            self._log(f"内容润色失败: {e}")
-            # 润色失败时返回原始内容
-            return sections_content
+            self._log(f"内容润色失败，未完成的章节保留原始内容: {e}")
+        return polished_content
     
-    def _generate_charts(self, sections_content: Dict[str, str]) -> Dict[str, str]:
+    async def _a_analyze_section_charts(self, section: str, content: str) -> List[Dict]:
+        """在并发上限内分析单个章节的图表需求（重试后仍失败时返回空列表）"""
+        try:
+            async with self._llm_sem:
+                return await self._call_with_retry(
+                    lambda: self.chart_agent.a_analyze_section_for_charts(section, content, self._sys_prompts["chart"]),
+                    f"章节 '{section}' 图表需求分析"
+                )
+        except Exception as e:
+            self._log(f"章节 '{section}' 图表需求分析失败: {e!r}")
+            return []
+    
+    async def _generate_charts(self,
+                               sections_content: Dict[str, str],
+                               chart_specs: Optional[Dict[str, asyncio.Task]] = None) -> Dict[str, str]:
         """
         生成图表
         
+        Args:
+            sections_content: 章节内容字典
+            chart_specs: 流水线中已启动的各章节图表需求分析任务；为None时在这里批量分析全部章节
+        
         为什么需要图表协调：
         1. 需求分析：分析内容的图表需求
         2. 生成管理：管理图表生成过程
@@ -236,11 +754,32 @@ class ReportCoordinator:
         """
         try:
             # 分析图表需求
-            chart_requirements = self.chart_agent.analyze_content_for_charts(sections_content)
+            if chart_specs is None:
+                try:
+                    async with self._llm_sem:
+                        chart_requirements = await self._call_with_retry(
+                            lambda: self.chart_agent.a_analyze_content_for_charts(
+                                sections_content, self._sys_prompts["chart"]
+                            ),
+                            "图表需求批量分析"
+                        )
+                except Exception as e:
+                    self._log(f"图表需求批量分析失败: {e!r}")
+                    chart_requirements = []
+            else:
+                # 按章节顺序汇总；没有分析任务的章节（如生成失败改用备用内容的章节）在这里补充分析
+                results = await asyncio.gather(*(
+                    chart_specs.get(section) or self._a_analyze_section_charts(section, content)
+                    for section, content in sections_content.items()
+                ), return_exceptions=True)
+                chart_requirements = [
+                    req for result in results if not isinstance(result, BaseException) for req in result
+                ]
+            self._log(f"识别出 {len(chart_requirements)} 个图表需求")
             
             # 生成图表
             if chart_requirements:
-                charts = self.chart_agent.generate_charts(chart_requirements)
+                charts = await self.chart_agent.a_generate_charts(chart_requirements, self._chart_pool)
                 self.workflow_status["charts_generated"] = True
                 self._log(f"图表生成成功，共 {len(charts)} 个图表")
                 return charts
@@ -252,7 +791,7 @@ class ReportCoordinator:
             self._log(f"图表生成失败: {e}")
             return {}
     
-    def _format_and_save_report(self, report_data: Dict, output_formats: List[str]) -> Dict[str, str]:
+    async def _format_and_save_report(self, report_data: Dict, output_formats: List[str]) -> Dict[str, str]:
         """
         格式化和保存报告
         
@@ -260,44 +799,133 @@ class ReportCoordinator:
         1. 用户需求：不同用户偏好不同格式
         2. 用途不同：不同格式适合不同用途
         3. 兼容性：确保在不同环境下的兼容性
+        
+        各格式的序列化和写入相互独立，放到线程池中同时进行，耗时接近最慢的一种格式
         """
         output_files = {}
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         base_filename = f"report_{timestamp}"
         
-        try:
-            for format_type in output_formats:
-                if format_type == "markdown":
-                    content = self.formatter.format_markdown(report_data)
-                    filepath = os.path.join(self.output_dir, f"{base_filename}.md")
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        f.write(content)
-                    output_files["markdown"] = filepath
-                    
-                elif format_type == "json":
-                    content = self.formatter.format_json(report_data)
-                    filepath = os.path.join(self.output_dir, f"{base_filename}.json")
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        f.write(content)
-                    output_files["json"] = filepath
-                    
-                elif format_type == "docx":
-                    filepath = os.path.join(self.output_dir, f"{base_filename}.docx")
-                    try:
-                        self.formatter.format_docx(report_data, filepath)
-                        output_files["docx"] = filepath
-                    except ImportError:
-                        self._log("警告：python-docx未安装，跳过Word格式输出")
-                    except Exception as e:
-                        self._log(f"Word格式输出失败: {e}")
+        formats = list(dict.fromkeys(output_formats))  # 去重，避免并发写同一个文件
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(None, self._save_format, format_type, report_data, base_filename)
+              for format_type in formats),
+            return_exceptions=True
+        )
+        
+        errors = []
+        for format_type, result in zip(formats, results):
+            if isinstance(result, Exception):
+                errors.append(result)
+            elif result:
+                output_files[format_type] = result
+        
+        if errors:
+            self._log(f"报告格式化失败: {errors[0]}")
+            raise Exception(f"报告格式化失败: {errors[0]}")
+        
+        self.workflow_status["report_formatted"] = True
+        self._log(f"报告已保存为 {len(output_files)} 种格式")
+        return output_files
+    
+    def _save_format(self, format_type: str, report_data: Dict, base_filename: str) -> Optional[str]:
+        """生成并保存一种格式的报告，返回文件路径；跳过的格式返回None（在线程池中执行）"""
+        # 所有格式都先写临时文件再替换，进程中途退出不会留下写了一半的报告
+        if format_type == "markdown":
+            # 逐段编码写入，不在内存中拼出完整报告
+            filepath = os.path.join(self.output_dir, f"{base_filename}.md")
+            atomic_write_chunks(filepath, (part.encode("utf-8") for part in self.formatter.iter_markdown(report_data)))
+            return filepath
             
-            self.workflow_status["report_formatted"] = True
-            self._log(f"报告已保存为 {len(output_files)} 种格式")
-            return output_files
+        elif format_type == "json":
+            content = self.formatter.format_json(report_data)
+            filepath = os.path.join(self.output_dir, f"{base_filename}.json")
+            atomic_write(filepath, content.encode("utf-8"))
+            return filepath
             
-        except Exception as e:
-            self._log(f"报告格式化失败: {e}")
-            raise Exception(f"报告格式化失败: {e}")
+        elif format_type == "docx":
+            filepath = os.path.join(self.output_dir, f"{base_filename}.docx")
+            tmp_path = filepath + ".tmp"
+            try:
+                self.formatter.format_docx(report_data, tmp_path)
+                os.replace(tmp_path, filepath)
+                return filepath
+            except ImportError:
+                self._log("警告：python-docx未安装，跳过Word格式输出")
+            except Exception as e:
+                self._log(f"Word格式输出失败: {e}")
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        
+        return None
+    
+    def _inputs_hash(self,
+                     topic: str,
+                     report_type: str,
+                     enable_charts: bool,
+                     enable_polish: bool,
+                     output_formats: List[str]) -> str:
+        """决定报告内容的全部输入的摘要（主题、选项和各任务使用的模型）"""
+        inputs = {
+            "topic": topic,
+            "report_type": report_type,
+            "enable_charts": enable_charts,
+            "enable_polish": enable_polish,
+            "batch_polish": self.batch_polish,
+            "output_formats": list(dict.fromkeys(output_formats)),
+            "models": self._model_routes,
+        }
+        payload = json.dumps(inputs, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _manifest_path(self, inputs_hash: str) -> str:
+        return os.path.join(self.output_dir, ".manifests", f"{inputs_hash}.json")
+    
+    def _save_manifest(self, inputs_hash: str, report_data: Dict, output_files: Dict[str, str]):
+        """
+        记录本次输入对应的报告数据、输出文件及其摘要，供 resume 模式复用
+        
+        为什么需要断点续跑：
+        整个LLM流水线是最耗时的部分；输入不变时，重新运行（如崩溃后或演示脚本反复执行）
+        可以直接复用已保存的输出，而不是重新调用所有模型
+        """
+        manifest = {
+            "data": report_data,
+            "output_files": output_files,
+            "digests": {path: read_digest(path) for path in output_files.values()},
+        }
+        try:
+            path = self._manifest_path(inputs_hash)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, json.dumps(manifest, ensure_ascii=False).encode("utf-8"), sidecar=False)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning("断点续跑记录保存失败: %s", e)
+    
+    def _load_manifest(self, inputs_hash: str) -> Optional[Dict]:
+        """读取可复用的记录；记录损坏、输出文件缺失或摘要与记录不一致时返回None（重新生成）"""
+        try:
+            with open(self._manifest_path(inputs_hash), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        # 记录可能来自旧版本或被手动修改：结构不符合预期时按不存在处理
+        if not isinstance(manifest, dict):
+            return None
+        data, output_files, digests = manifest.get("data"), manifest.get("output_files"), manifest.get("digests")
+        if not (isinstance(data, dict) and isinstance(output_files, dict) and isinstance(digests, dict)):
+            return None
+        if not all(isinstance(path, str) for path in output_files.values()):
+            return None
+        
+        for path in output_files.values():
+            if not os.path.exists(path):
+                return None
+            recorded = digests.get(path)
+            if recorded is not None and read_digest(path) != recorded:
+                return None
+        return manifest
     
     def _log(self, message: str):
         """
@@ -309,10 +937,8 @@ class ReportCoordinator:
         3. 用户反馈：向用户提供进度信息
         4. 审计：记录系统操作历史
         """
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = f"[{timestamp}] {message}"
-        self.generation_log.append(log_entry)
-        print(f"[ReportCoordinator] {message}")
+        self.generation_log.append(f"[{_log_timestamp()}] {message}")
+        logger.info(message)
     
     def get_system_status(self) -> Dict:
         """
@@ -325,7 +951,7 @@ class ReportCoordinator:
         """
         return {
             "workflow_status": self.workflow_status,
-            "recent_logs": self.generation_log[-10:],  # 最近10条日志
+            "recent_logs": list(self.generation_log)[-10:],  # 最近10条日志
             "agents_status": {
                 "outline_agent": self.outline_agent.agent_name,
                 "content_agent": self.content_agent.agent_name,
@@ -351,5 +977,5 @@ class ReportCoordinator:
             "charts_generated": False,
             "report_formatted": False
         }
-        self.generation_log = []
+        self.generation_log.clear()
         self._log("工作流程状态已重置")
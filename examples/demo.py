@@ -63,6 +63,9 @@ def demo_basic_usage():
     else:
         print("❌ 报告生成失败")
         print(f"错误信息: {result['error']}")
+    
+    # 释放图表渲染进程池和HTTP连接池
+    coordinator.close()
 
 def demo_advanced_usage():
     """
@@ -96,6 +99,8 @@ def demo_advanced_usage():
     print(f"\n🔧 系统状态:")
     print(f"   工作流程状态: {status['workflow_status']}")
     print(f"   输出目录: {status['output_directory']}")
+    
+    coordinator.close()
 
 def demo_custom_workflow():
     """
@@ -130,6 +135,8 @@ def demo_custom_workflow():
         )
         sections_content[section] = content
         print(f"   ✅ 已生成: {section}")
+    
+    coordinator.close()
 
 def main():
     """
@@ -0,0 +1,84 @@
+"""
+暂时性错误的重试：智能体把由限流等错误降级而来的结果还原为异常，交给 with_retry 重试
+"""
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.content_agent import ContentAgent
+from agents.polish_agent import PolishAgent
+from utils.llm_cache import CachedLLMClient
+from utils.llm_client import DegradedText
+from utils.retry import with_retry
+
+
+class _StatusError(Exception):
+    """带HTTP状态码的错误（与 openai/httpx 异常的 status_code 属性一致）"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class _FlakyClient:
+    """前 failures 次调用返回由 status_code 错误降级的内容，之后返回正常内容"""
+
+    model_type = "fake"
+    model_name = "fake-model"
+    temperature = 0
+
+    def __init__(self, status_code: int, failures: int = 1):
+        self.status_code = status_code
+        self.failures = failures
+        self.calls = 0
+
+    async def agenerate_text(self, prompt, max_tokens=1000, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            return DegradedText("降级内容", _StatusError(self.status_code))
+        return "这是正常生成的章节内容。" * 10
+
+
+def _generate(client: _FlakyClient) -> str:
+    agent = ContentAgent(CachedLLMClient(client, cache_dir=None, enabled=False))
+    context = {"topic": "主题", "outline": ["章节"], "generated_sections": {}, "current_section_index": 0}
+    return asyncio.run(with_retry(
+        lambda: agent.a_generate_section_content("章节", "主题", context),
+        attempts=3, base=0.01
+    ))
+
+
+class RetryTest(unittest.TestCase):
+
+    def test_rate_limited_call_is_retried(self):
+        client = _FlakyClient(429)
+        content = _generate(client)
+        self.assertEqual(client.calls, 2)
+        self.assertIn("正常生成", content)
+
+    def test_gives_up_after_attempts(self):
+        client = _FlakyClient(503, failures=5)
+        with self.assertRaises(_StatusError):
+            _generate(client)
+        self.assertEqual(client.calls, 3)
+
+    def test_non_retryable_error_falls_back_without_retry(self):
+        client = _FlakyClient(401)
+        content = _generate(client)
+        self.assertEqual(client.calls, 1)
+        self.assertNotIn("正常生成", content)
+
+    def test_style_sheet_extraction_is_retried(self):
+        client = _FlakyClient(429)
+        agent = PolishAgent(CachedLLMClient(client, cache_dir=None, enabled=False))
+        style_sheet = asyncio.run(with_retry(lambda: agent.a_extract_style_sheet("润色后的首个章节"), attempts=3, base=0.01))
+        self.assertEqual(client.calls, 2)
+        self.assertIn("正常生成", style_sheet)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,6 @@
 # utils 包初始化文件
 from .llm_client import LLMClient
-from .report_formatter import ReportFormatter
+from .llm_cache import CachedLLMClient
 from .config_manager import ConfigManager, config_manager
 from .logger import LogManager, log_manager
 from .exceptions import (
@@ -14,6 +14,7 @@ from .exceptions import (
 
 __all__ = [
     'LLMClient',
+    'CachedLLMClient',
     'ReportFormatter', 
     'ConfigManager',
     'LogManager',
@@ -26,3 +27,15 @@ __all__ = [
     'GenerationTimeoutError',
     'FileProcessingError'
 ]
+
+
+def __getattr__(name):
+    """
+    按需导入 ReportFormatter（PEP 562）
+
+    只用到LLM客户端或配置管理时，import utils 不加载报告格式化模块
+    """
+    if name == "ReportFormatter":
+        from .report_formatter import ReportFormatter
+        return ReportFormatter
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,99 @@
 # 配置管理器 - 统一的配置管理
 
+import copy
+import hashlib
 import json
 import os
-from typing import Any, Dict, Optional
-from dotenv import load_dotenv
+from typing import Any, Dict, Optional, Tuple
+from utils.env import load_env
+from utils.file_writer import atomic_write
+
+# 优先使用orjson读写配置文件，未安装时回退到标准库
+# orjson.JSONDecodeError 是 json.JSONDecodeError 的子类，异常处理保持不变
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 加载环境变量
-load_dotenv()
+load_env()
+
+# 已解析的配置文件：(绝对路径, 修改时间, 文件大小) -> (配置字典, 文件内容摘要)
+# 同一文件未改动时，多次创建 ConfigManager 不再重复读取和解析
+_PARSE_CACHE: Dict[Tuple[str, int, int], Tuple[Dict[str, Any], bytes]] = {}
+
+# 已通过校验的配置文件内容摘要（blake2b），内容相同的配置不再重复校验
+_VALIDATED_HASHES = set()
+
+# 配置的结构要求：必需的配置项存在且不为 null
+_NOT_NULL = {"not": {"type": "null"}}
+_SCHEMA = {
+    "type": "object",
+    "required": ["system", "agents"],
+    "properties": {
+        "system": {
+            "type": "object",
+            "required": ["default_model_type", "default_output_dir"],
+            "properties": {
+                "default_model_type": _NOT_NULL,
+                "default_output_dir": _NOT_NULL
+            }
+        },
+        "agents": {
+            "type": "object",
+            "required": ["outline_agent", "content_agent"],
+            "properties": {
+                "outline_agent": _NOT_NULL,
+                "content_agent": _NOT_NULL
+            }
+        }
+    }
+}
+
+def _required_paths(schema: Dict[str, Any], prefix: Tuple[str, ...] = ()):
+    """列出 schema 中所有必需配置项的键路径（未安装 jsonschema 时用于检查）"""
+    for name in schema.get("required", ()):
+        path = prefix + (name,)
+        yield path
+        yield from _required_paths(schema.get("properties", {}).get(name, {}), path)
+
+def _flatten(node: Dict[str, Any], prefix: str = ""):
+    """遍历嵌套配置，产出 (点分割的键路径, 值)，中间层的字典也包含在内"""
+    for k, v in node.items():
+        key = f"{prefix}{k}"
+        yield key, v
+        if isinstance(v, dict):
+            yield from _flatten(v, key + ".")
+
+# 校验器只在导入时构建一次，所有实例共用；jsonschema 为可选依赖
+try:
+    import jsonschema
+    _VALIDATOR = jsonschema.Draft7Validator(_SCHEMA)
+except ImportError:
+    _VALIDATOR = None
+    _REQUIRED_PATHS = tuple(_required_paths(_SCHEMA))
+
+# 各模型类型的模型配置；函数在调用时才读取配置和环境变量，未知类型按演示模式处理
+_MODEL_CONFIG_BUILDERS = {
+    "openai": lambda cm: {
+        "model_type": "openai",
+        "model_name": cm.get("system.default_model_name", "gpt-3.5-turbo"),
+        "api_key": os.getenv("OPENAI_API_KEY"),
+        "base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+    },
+    "vllm": lambda cm: {
+        "model_type": "vllm",
+        "model_name": cm.get("system.default_model_name", "Qwen/Qwen2-7B-Instruct"),
+        "api_key": "dummy",
+        "base_url": os.getenv("VLLM_BASE_URL", "http://localhost:8000")
+    },
+    "demo": lambda cm: {
+        "model_type": "demo",
+        "model_name": "demo-model",
+        "api_key": None,
+        "base_url": None
+    },
+}
 
 class ConfigurationError(Exception):
     """配置错误"""
@@ -23,17 +110,33 @@ class ConfigManager:
             config_file: 配置文件路径
         """
         self.config_file = config_file
+        self._config_hash: Optional[bytes] = None  # 配置文件内容摘要，配置被修改或使用默认配置时为None
         self.config = self._load_config()
+        self._reindex()
         self._validate_config()
     
-    def _load_config(self) -> Dict[str, Any]:
-        """加载配置文件"""
+    def _load_config(self, refresh: bool = False) -> Dict[str, Any]:
+        """加载配置文件（文件未改动时复用已解析的结果，refresh=True 时强制重新读取）"""
+        self._config_hash = None
         try:
-            if os.path.exists(self.config_file):
-                with open(self.config_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            else:
+            try:
+                st = os.stat(self.config_file)
+            except FileNotFoundError:
                 return self._get_default_config()
+            
+            path = os.path.abspath(self.config_file)
+            key = (path, st.st_mtime_ns, st.st_size)
+            if refresh or key not in _PARSE_CACHE:
+                with open(self.config_file, 'rb') as f:
+                    data = f.read()
+                config = orjson.loads(data) if orjson is not None else json.loads(data.decode('utf-8'))
+                # 同一文件只保留最新版本的解析结果
+                for stale in [k for k in _PARSE_CACHE if k[0] == path]:
+                    del _PARSE_CACHE[stale]
+                _PARSE_CACHE[key] = (config, hashlib.blake2b(data, digest_size=16).digest())
+            config, self._config_hash = _PARSE_CACHE[key]
+            # 返回副本：调用 set() 修改配置不影响缓存和其他实例
+            return copy.deepcopy(config)
         except json.JSONDecodeError as e:
             raise ConfigurationError(f"配置文件格式错误: {e}")
         except Exception as e:
@@ -82,21 +185,20 @@ class ConfigManager:
             default: 默认值
             
         Returns:
-            配置值
+            配置值；字典和列表类型的值返回副本，修改配置需通过 set()
+            （修改返回值不会影响配置，否则 get() 使用的索引会与配置不一致）
         """
-        keys = key.split('.')
-        value = self.config
-        
         try:
-            for k in keys:
-                value = value[k]
-            return value
-        except (KeyError, TypeError):
+            value = self._flat[key]
+        except KeyError:
             return default
+        if isinstance(value, (dict, list)):
+            return copy.deepcopy(value)
+        return value
     
     def set(self, key: str, value: Any) -> None:
         """
-        设置配置值
+        设置配置值（修改配置应通过 set()，以便同步更新 get() 使用的索引）
         
         Args:
             key: 配置键
@@ -113,57 +215,61 @@ class ConfigManager:
         
         # 设置值
         config[keys[-1]] = value
+        self._config_hash = None  # 配置已不同于文件内容
+        
+        # 很少调用，直接重建索引（新建的中间层和被替换的子树都会更新）
+        self._reindex()
+    
+    def _reindex(self) -> None:
+        """重建 get() 使用的扁平索引"""
+        self._flat = dict(_flatten(self.config))  # 点分割键路径 -> 配置值，get() 一次查找即可
     
     def _validate_config(self) -> None:
-        """验证配置完整性"""
-        required_keys = [
-            "system.default_model_type",
-            "system.default_output_dir",
-            "agents.outline_agent",
-            "agents.content_agent"
-        ]
+        """验证配置完整性（一次报告所有问题；内容相同的配置文件只校验一次）"""
+        if self._config_hash is not None and self._config_hash in _VALIDATED_HASHES:
+            return
+        
+        if _VALIDATOR is not None:
+            errors = sorted(_VALIDATOR.iter_errors(self.config), key=lambda e: list(e.absolute_path))
+            if errors:
+                raise ConfigurationError("配置验证失败: " + "; ".join(
+                    f"{'.'.join(map(str, e.absolute_path)) or '(根)'}: {e.message}" for e in errors
+                ))
+        else:
+            missing = []
+            for path in _REQUIRED_PATHS:
+                node = self.config
+                for k in path:
+                    node = node.get(k) if isinstance(node, dict) else None
+                if node is None:
+                    missing.append('.'.join(path))
+            if missing:
+                raise ConfigurationError(f"缺少必需的配置项: {', '.join(missing)}")
         
-        for key in required_keys:
-            if self.get(key) is None:
-                raise ConfigurationError(f"缺少必需的配置项: {key}")
+        if self._config_hash is not None:
+            _VALIDATED_HASHES.add(self._config_hash)
     
     def get_model_config(self) -> Dict[str, Any]:
         """获取模型配置"""
         model_type = self.get("system.default_model_type", "demo")
-        
-        if model_type == "openai":
-            return {
-                "model_type": "openai",
-                "model_name": self.get("system.default_model_name", "gpt-3.5-turbo"),
-                "api_key": os.getenv("OPENAI_API_KEY"),
-                "base_url": os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
-            }
-        elif model_type == "vllm":
-            return {
-                "model_type": "vllm",
-                "model_name": self.get("system.default_model_name", "Qwen/Qwen2-7B-Instruct"),
-                "api_key": "dummy",
-                "base_url": os.getenv("VLLM_BASE_URL", "http://localhost:8000")
-            }
-        else:  # demo模式
-            return {
-                "model_type": "demo",
-                "model_name": "demo-model",
-                "api_key": None,
-                "base_url": None
-            }
+        builder = _MODEL_CONFIG_BUILDERS.get(model_type, _MODEL_CONFIG_BUILDERS["demo"])
+        return builder(self)
     
     def save_config(self) -> None:
-        """保存配置到文件"""
+        """保存配置到文件（整体序列化后原子替换，写入中途失败不会留下半个配置文件）"""
         try:
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=2, ensure_ascii=False)
+            if orjson is not None:
+                data = orjson.dumps(self.config, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            else:
+                data = json.dumps(self.config, indent=2, ensure_ascii=False).encode('utf-8')
+            atomic_write(self.config_file, data, sidecar=False)
         except Exception as e:
             raise ConfigurationError(f"保存配置文件失败: {e}")
     
     def reload_config(self) -> None:
         """重新加载配置"""
-        self.config = self._load_config()
+        self.config = self._load_config(refresh=True)
+        self._reindex()
         self._validate_config()
 
 # 全局配置实例
@@ -0,0 +1,21 @@
+"""
+环境变量加载
+进程内只读取一次 .env 文件，各模块共用
+"""
+import functools
+
+
+@functools.lru_cache(maxsize=None)
+def load_env() -> bool:
+    """
+    加载 .env 文件中的环境变量（只在首次调用时执行）
+
+    为什么只加载一次：
+    1. 多个模块导入时都需要环境变量，重复调用会重复查找和解析 .env 文件
+    2. 已设置的环境变量不会被覆盖，重复加载也不会带来新的结果
+
+    Returns:
+        是否找到并加载了 .env 文件
+    """
+    from dotenv import load_dotenv
+    return load_dotenv()
@@ -0,0 +1,140 @@
+"""
+文件写入工具
+报告输出路径上的文件写入：整体编码一次直接写入文件描述符，以及带摘要校验的原子写入（整体或逐块）
+"""
+import hashlib
+import os
+from typing import Iterable, Optional
+
+# Windows 上需要以二进制方式打开，避免换行符被转换
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+# sha256 旁路文件的后缀
+DIGEST_SUFFIX = ".sha256"
+
+
+def _write_all(fd: int, data: bytes) -> None:
+    """将全部字节写入文件描述符（os.write 可能只写入一部分）"""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+def write_text(path: str, text: str, encoding: str = "utf-8") -> int:
+    """
+    将文本一次性写入文件（覆盖已有内容）
+
+    Args:
+        path: 文件路径
+        text: 文本内容
+        encoding: 文本编码
+
+    Returns:
+        写入的字节数
+
+    为什么不用 open(path, 'w')：
+    1. 开销：绕过文本层和缓冲层，整段内容只编码一次、通常只需一次 write 系统调用
+    2. 一致性：按原样写入 '\\n'，各平台输出的文件内容完全相同
+    """
+    data = text.encode(encoding)
+    fd = os.open(path, _WRITE_FLAGS, 0o666)
+    try:
+        _write_all(fd, data)
+    finally:
+        os.close(fd)
+    return len(data)
+
+
+def read_digest(path: str) -> Optional[str]:
+    """读取 path 对应的 sha256 旁路文件（path + ".sha256"），不存在时返回None"""
+    try:
+        with open(path + DIGEST_SUFFIX, "r", encoding="ascii") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def atomic_write(path: str, data: bytes, sidecar: bool = True) -> str:
+    """
+    原子地写入文件：先写临时文件并落盘，再用 os.replace 替换目标文件
+
+    Args:
+        path: 文件路径
+        data: 文件内容
+        sidecar: 是否维护 sha256 旁路文件（path + ".sha256"）；内容与已有文件一致时跳过写入
+
+    Returns:
+        内容的 sha256 十六进制摘要
+
+    为什么需要原子写入：
+    1. 完整性：进程在写入中途崩溃时，目标文件要么是旧内容要么是新内容，不会只写了一半
+    2. 幂等：重复运行产生相同内容时不再重写文件
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    if sidecar and os.path.exists(path) and read_digest(path) == digest:
+        return digest
+
+    tmp_path = path + ".tmp"
+    fd = os.open(tmp_path, _WRITE_FLAGS, 0o666)
+    try:
+        try:
+            _write_all(fd, data)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # 写入失败时清理临时文件，目标文件保持原样
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if sidecar:
+        write_text(path + DIGEST_SUFFIX, digest + "\n", encoding="ascii")
+    return digest
+
+
+def atomic_write_chunks(path: str, chunks: Iterable[bytes], sidecar: bool = True) -> str:
+    """
+    原子地写入逐块产生的文件内容（与 atomic_write 的结果相同）
+
+    Args:
+        path: 文件路径
+        chunks: 依次产出文件内容各部分的可迭代对象
+        sidecar: 是否维护 sha256 旁路文件；内容与已有文件一致时保留已有文件
+
+    Returns:
+        内容的 sha256 十六进制摘要
+
+    为什么需要逐块写入：
+    大型报告不必先拼出完整的字符串和字节串再写盘，摘要在写入临时文件的同时增量计算，
+    峰值内存不随报告长度增长
+    """
+    hasher = hashlib.sha256()
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in chunks:
+                hasher.update(chunk)
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        digest = hasher.hexdigest()
+        if sidecar and os.path.exists(path) and read_digest(path) == digest:
+            # 内容未变化：丢弃临时文件，不改动已有文件
+            os.unlink(tmp_path)
+            return digest
+        os.replace(tmp_path, path)
+    except BaseException:
+        # 写入失败时清理临时文件，目标文件保持原样
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    if sidecar:
+        write_text(path + DIGEST_SUFFIX, digest + "\n", encoding="ascii")
+    return digest
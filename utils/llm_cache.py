@@ -0,0 +1,382 @@
+"""
+大语言模型响应缓存
+为LLMClient提供精确匹配 + 语义相似两级缓存，避免重复的LLM调用
+"""
+import os
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from utils.llm_client import DegradedText
+
+logger = logging.getLogger(__name__)
+
+# 默认磁盘缓存目录
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "report_agent")
+
+
+class CachedLLMClient:
+    """
+    带缓存的LLM客户端包装器
+
+    设计理念：
+    1. 透明替换：与LLMClient保持相同的调用接口，智能体无需感知缓存
+    2. 精确缓存：以提示词的SHA-256为键，内存LRU + 磁盘缓存两层存储
+    3. 语义缓存：可选的向量相似度检索，命中近似重复的提示词
+    4. 优雅降级：diskcache、sentence-transformers、faiss 未安装时自动跳过对应层
+    """
+
+    def __init__(self,
+                 llm_client,
+                 max_size: int = 256,
+                 cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 semantic: bool = False,
+                 similarity_threshold: float = 0.92,
+                 embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 enabled: bool = True,
+                 cache_sampled: bool = False):
+        """
+        初始化缓存客户端
+
+        Args:
+            llm_client: 被包装的LLM客户端
+            max_size: 内存LRU缓存的最大条目数
+            cache_dir: 磁盘缓存目录，为None时不使用磁盘缓存
+            semantic: 是否启用语义缓存（默认关闭，近似提示词可能对应不同章节）
+            similarity_threshold: 语义缓存命中所需的最小余弦相似度
+            embedding_model: 语义缓存使用的句向量模型
+            enabled: 是否启用缓存；关闭时所有请求直接透传给被包装的客户端
+                （仍保留包装层，避免智能体再次包装出一个启用的缓存）
+            cache_sampled: 是否缓存 temperature > 0 的采样结果；默认不缓存，
+                同一提示词每次采样的输出本应不同，宁可未命中也不错误复用
+        """
+        self.llm_client = llm_client
+        self.max_size = max_size
+        self.enabled = enabled
+        self.cache_sampled = cache_sampled
+        self.semantic = semantic and enabled
+        self.similarity_threshold = similarity_threshold
+        self.embedding_model = embedding_model
+
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = self._open_disk_cache(cache_dir)
+
+        # 语义缓存状态（首次使用时初始化）：每个命名空间一个向量索引，
+        # 向量与内存缓存中的条目一一对应，条目被LRU淘汰时同时移除其向量
+        self._encoder = None
+        self._faiss = None
+        self._numpy = None
+        self._indexes: Dict[str, Any] = {}          # 命名空间 -> 向量索引
+        self._vector_ids: Dict[str, tuple] = {}     # 缓存键 -> (命名空间, 向量ID)
+        self._vector_keys: Dict[int, str] = {}      # 向量ID -> 缓存键
+        self._next_vector_id = 0
+
+        self.stats = {"hits": 0, "semantic_hits": 0, "misses": 0}
+
+    @classmethod
+    def wrap(cls, llm_client) -> "CachedLLMClient":
+        """包装LLM客户端；已经是缓存客户端时直接返回，避免重复包装"""
+        if isinstance(llm_client, cls):
+            return llm_client
+        return cls(llm_client)
+
+    def __getattr__(self, name: str) -> Any:
+        # 未定义的属性（model_type、model_name等）透传给被包装的客户端
+        if name == "llm_client":
+            raise AttributeError(name)
+        return getattr(self.llm_client, name)
+
+    def generate_text(self, prompt: str, max_tokens: int = 1000, **kwargs) -> str:
+        """
+        生成文本（优先从缓存读取）
+
+        Args:
+            prompt: 输入提示词
+            max_tokens: 最大生成长度
+            **kwargs: 透传给被包装客户端的其他参数
+
+        Returns:
+            生成的文本内容
+        """
+        key = self._make_key(prompt, max_tokens, kwargs)
+
+        cached = self._lookup(key)
+        if cached is not None:
+            self._count("hits")
+            return cached
+
+        # 提示词向量只计算一次，同时用于检索和入库
+        vector = self._embed(prompt) if self.semantic and self._active() else None
+        namespace = self._namespace(max_tokens, kwargs)
+        if vector is not None:
+            cached = self._semantic_lookup(vector, namespace)
+            if cached is not None:
+                self._count("semantic_hits")
+                return cached
+
+        self._count("misses")
+        response = self.llm_client.generate_text(prompt, max_tokens, **kwargs)
+        if self._is_cacheable(response):
+            self._store(key, response)
+            if vector is not None:
+                self._semantic_add(vector, namespace, key)
+        return response
+
+    async def agenerate_text(self, prompt: str, max_tokens: int = 1000, **kwargs) -> str:
+        """
+        异步生成文本（优先从缓存读取）
+
+        语义缓存的向量计算是CPU密集的同步操作，放到线程池中执行，不阻塞事件循环
+        """
+        key = self._make_key(prompt, max_tokens, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            self._count("hits")
+            return cached
+
+        vector = await self._aembed(prompt) if self.semantic and self._active() else None
+        namespace = self._namespace(max_tokens, kwargs)
+        if vector is not None:
+            cached = self._semantic_lookup(vector, namespace)
+            if cached is not None:
+                self._count("semantic_hits")
+                return cached
+
+        self._count("misses")
+        response = await self.llm_client.agenerate_text(prompt, max_tokens, **kwargs)
+        if self._is_cacheable(response):
+            self._store(key, response)
+            if vector is not None:
+                self._semantic_add(vector, namespace, key)
+        return response
+
+    def stream_text(self, prompt: str, max_tokens: int = 1000, **kwargs) -> Iterator[str]:
+        """
+        流式生成文本（命中缓存时一次性产出缓存内容）
+
+        流式输出完整结束且不含降级内容时，拼接后的结果写入缓存
+        """
+        key = self._make_key(prompt, max_tokens, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            self._count("hits")
+            yield cached
+            return
+
+        self._count("misses")
+        chunks = []
+        cacheable = True
+        for chunk in self.llm_client.stream_text(prompt, max_tokens, **kwargs):
+            if isinstance(chunk, DegradedText):
+                cacheable = False
+            chunks.append(chunk)
+            yield chunk
+
+        response = "".join(chunks)
+        if cacheable and response:
+            self._store(key, response)
+
+    async def astream_text(self, prompt: str, max_tokens: int = 1000, **kwargs) -> AsyncIterator[str]:
+        """异步流式生成文本（命中缓存时一次性产出缓存内容，含语义缓存）"""
+        key = self._make_key(prompt, max_tokens, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            self._count("hits")
+            yield cached
+            return
+
+        vector = await self._aembed(prompt) if self.semantic and self._active() else None
+        namespace = self._namespace(max_tokens, kwargs)
+        if vector is not None:
+            cached = self._semantic_lookup(vector, namespace)
+            if cached is not None:
+                self._count("semantic_hits")
+                yield cached
+                return
+
+        self._count("misses")
+        chunks = []
+        cacheable = True
+        async for chunk in self.llm_client.astream_text(prompt, max_tokens, **kwargs):
+            if isinstance(chunk, DegradedText):
+                cacheable = False
+            chunks.append(chunk)
+            yield chunk
+
+        response = "".join(chunks)
+        if cacheable and response:
+            self._store(key, response)
+            if vector is not None:
+                self._semantic_add(vector, namespace, key)
+
+    def batch_generate(self, prompts: list, max_tokens: int = 1000, max_workers: Optional[int] = None) -> list:
+        """批量生成文本（逐条走缓存，未命中的请求用线程池并发发出，结果按输入顺序返回）"""
+        if not prompts:
+            return []
+        
+        workers = max_workers or min(16, len(prompts))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda prompt: self.generate_text(prompt, max_tokens), prompts))
+
+    def clear(self) -> None:
+        """清空内存缓存、磁盘缓存和语义索引"""
+        with self._lock:
+            self._memory.clear()
+            self._indexes.clear()
+            self._vector_ids.clear()
+            self._vector_keys.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def _active(self) -> bool:
+        """当前请求是否读写缓存（温度在每次请求时检查，客户端的温度可能被修改）"""
+        if not self.enabled:
+            return False
+        return self.cache_sampled or not getattr(self.llm_client, "temperature", 0) > 0
+
+    def _model_tag(self) -> str:
+        """模型和采样温度：温度不同的请求不能互相命中"""
+        temperature = getattr(self.llm_client, "temperature", None)
+        return f"{self.llm_client.model_type}/{self.llm_client.model_name}@{temperature}"
+
+    def _namespace(self, max_tokens: int, kwargs: Dict) -> str:
+        """同一命名空间内的提示词才允许互相命中"""
+        namespace = f"{self._model_tag()}|{max_tokens}"
+        if kwargs:
+            namespace += repr(sorted(kwargs.items()))
+        return namespace
+
+    def _make_key(self, prompt: str, max_tokens: int, kwargs: Dict) -> str:
+        raw = self._model_tag() + prompt + str(max_tokens)
+        if kwargs:
+            raw += repr(sorted(kwargs.items()))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _is_cacheable(response: str) -> bool:
+        # 降级生成的内容（API失败时的提示或演示内容）不应进入缓存
+        return bool(response) and not isinstance(response, DegradedText)
+
+    @staticmethod
+    def _open_disk_cache(cache_dir: Optional[str]):
+        if not cache_dir:
+            return None
+        try:
+            import diskcache
+        except ImportError:
+            return None
+        try:
+            return diskcache.Cache(cache_dir)
+        except Exception as e:
+            logger.warning("磁盘缓存不可用: %s", e)
+            return None
+
+    def _count(self, name: str) -> None:
+        # 计数器会被批量生成的线程池和事件循环并发更新
+        with self._lock:
+            self.stats[name] += 1
+
+    def _lookup(self, key: str) -> Optional[str]:
+        if not self._active():
+            return None
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        if self._disk is not None:
+            value = self._disk.get(key)
+            if value is not None:
+                self._remember(key, value)
+                return value
+        return None
+
+    def _store(self, key: str, response: str) -> None:
+        if not self._active():
+            return
+        self._remember(key, response)
+        if self._disk is not None:
+            try:
+                self._disk.set(key, str(response))
+            except Exception as e:
+                logger.warning("写入磁盘缓存失败: %s", e)
+
+    def _remember(self, key: str, response: str) -> None:
+        with self._lock:
+            self._memory[key] = response
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                evicted, _ = self._memory.popitem(last=False)
+                self._forget_vector(evicted)
+
+    def _embed(self, prompt: str):
+        """计算归一化的句向量；依赖缺失时关闭语义缓存"""
+        if self._encoder is None:
+            # 并发的首次请求只加载一次模型；其他状态先于 _encoder 赋值，
+            # 未加锁读到 _encoder 时它们一定已就绪
+            with self._lock:
+                if not self.semantic:
+                    return None
+                if self._encoder is None:
+                    try:
+                        import faiss
+                        import numpy
+                        from sentence_transformers import SentenceTransformer
+                    except ImportError:
+                        logger.warning("未安装 sentence-transformers/faiss，已关闭语义缓存")
+                        self.semantic = False
+                        return None
+                    encoder = SentenceTransformer(self.embedding_model)
+                    self._faiss, self._numpy = faiss, numpy
+                    self._encoder = encoder
+        return self._encoder.encode([prompt], normalize_embeddings=True).astype("float32")
+
+    async def _aembed(self, prompt: str):
+        """在线程池中计算句向量（模型推理是CPU密集的同步操作）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._embed, prompt)
+
+    def _semantic_lookup(self, vector, namespace: str) -> Optional[str]:
+        # 只在同一命名空间的索引中检索：其他命名空间的近似提示词不会遮住本命名空间的命中
+        with self._lock:
+            index = self._indexes.get(namespace)
+            if index is None or index.ntotal == 0:
+                return None
+            scores, ids = index.search(vector, 1)
+            score, vector_id = float(scores[0][0]), int(ids[0][0])
+            if vector_id < 0 or score < self.similarity_threshold:
+                return None
+            key = self._vector_keys[vector_id]
+        return self._lookup(key)
+
+    def _semantic_add(self, vector, namespace: str, key: str) -> None:
+        with self._lock:
+            # 条目已被淘汰（并发写入较多时）或已有向量时不再加入
+            if key not in self._memory or key in self._vector_ids:
+                return
+            index = self._indexes.get(namespace)
+            if index is None:
+                dim = self._encoder.get_sentence_embedding_dimension()
+                index = self._indexes[namespace] = self._faiss.IndexIDMap(self._faiss.IndexFlatIP(dim))
+            vector_id = self._next_vector_id
+            self._next_vector_id += 1
+            index.add_with_ids(vector, self._numpy.array([vector_id], dtype="int64"))
+            self._vector_ids[key] = (namespace, vector_id)
+            self._vector_keys[vector_id] = key
+
+    def _forget_vector(self, key: str) -> None:
+        """移除被淘汰条目的向量（调用方持有 _lock）"""
+        entry = self._vector_ids.pop(key, None)
+        if entry is None:
+            return
+        namespace, vector_id = entry
+        del self._vector_keys[vector_id]
+        index = self._indexes[namespace]
+        index.remove_ids(self._numpy.array([vector_id], dtype="int64"))
+        if index.ntotal == 0:
+            del self._indexes[namespace]
@@ -4,12 +4,149 @@
 """
 import os
 import json
-import requests
-from typing import Optional, Dict, Any
-from dotenv import load_dotenv
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, Dict, Any, Iterator, AsyncIterator
+from utils.env import load_env
+from utils.retry import is_retryable, with_retry
+
+if TYPE_CHECKING:
+    import requests
 
 # 加载环境变量
-load_dotenv()
+load_env()
+
+# requests 在首次发出同步HTTP请求时才导入：演示模式和只用异步接口时不加载
+_requests = None
+
+def _get_requests():
+    """导入并缓存 requests 模块"""
+    global _requests
+    if _requests is None:
+        import requests
+        _requests = requests
+    return _requests
+
+def create_http_session(pool_size: int = 16, retries: int = 3) -> "requests.Session":
+    """
+    创建带连接池和自动重试的 requests.Session
+    
+    为什么需要复用会话：
+    1. 连接复用：keep-alive 省去每次请求的TCP/TLS握手
+    2. 容错：网关错误（502/503/504）和连接失败按指数退避自动重试
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.2,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=None,  # 生成请求是POST，默认不在重试范围内
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = _get_requests().Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+# 常见模型单次回复的输出token上限（按模型名前缀匹配，最长的前缀优先）；
+# 未列出的模型使用 DEFAULT_MAX_OUTPUT_TOKENS，可用 LLM_MAX_OUTPUT_TOKENS 环境变量统一覆盖
+_MAX_OUTPUT_TOKENS = {
+    "gpt-3.5-turbo": 4096,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 4096,
+    "gpt-4o": 16384,
+}
+DEFAULT_MAX_OUTPUT_TOKENS = 4096
+
+def default_max_output_tokens(model_name: str) -> int:
+    """模型单次回复允许的最大输出token数（max_tokens 超过它时服务端会直接拒绝请求）"""
+    override = os.getenv("LLM_MAX_OUTPUT_TOKENS")
+    if override:
+        return int(override)
+    prefixes = [prefix for prefix in _MAX_OUTPUT_TOKENS if model_name.startswith(prefix)]
+    if not prefixes:
+        return DEFAULT_MAX_OUTPUT_TOKENS
+    return _MAX_OUTPUT_TOKENS[max(prefixes, key=len)]
+
+# 默认的系统提示词
+DEFAULT_SYSTEM_PROMPT = "你是一个专业的报告撰写助手，请根据用户需求生成高质量、详细的内容。"
+
+class DegradedText(str):
+    """
+    降级生成的文本
+
+    API调用失败时返回的提示信息或演示内容，行为与普通字符串一致，
+    但调用方（如缓存层）可以据此识别并避免保存这类结果。
+    error 属性保存导致降级的异常，调用方可以据此判断是否值得重试（见 raise_if_retryable）。
+    """
+    
+    def __new__(cls, text: str = "", error: Optional[BaseException] = None):
+        obj = super().__new__(cls, text)
+        obj.error = error
+        return obj
+
+def raise_if_retryable(text: str) -> None:
+    """
+    文本是由暂时性错误（限流、超时、连接失败、5xx）降级而来时，重新抛出该错误
+    
+    LLMClient 失败时返回降级内容而不是抛出异常；需要重试的调用方（如协调器）
+    用它把暂时性错误还原为异常，交给 utils.retry.with_retry 处理
+    """
+    error = getattr(text, "error", None)
+    if error is not None and is_retryable(error):
+        raise error
+
+# 演示模式的固定回复
+_DEMO_OUTLINE = """1. 概述与背景
+2. 现状分析
+3. 核心技术/方法
+4. 应用案例
+5. 发展趋势
+6. 挑战与机遇
+7. 结论与建议"""
+
+_DEMO_CHART = """建议生成以下图表：
+1. 发展趋势折线图 - 展示技术发展历程
+2. 对比分析柱状图 - 不同方案的优劣对比
+3. 市场份额饼图 - 各厂商市场占比
+4. 流程图 - 核心技术实现流程"""
+
+_DEMO_CONTENT = """{topic}是当前重要的研究领域和发展方向。
+
+在技术层面，{topic}具有以下特点：
+- 创新性强，技术架构先进
+- 应用场景广泛，市场前景良好  
+- 具备良好的可扩展性和兼容性
+- 安全性和稳定性不断提升
+
+从发展现状来看，{topic}正处于快速发展期，主要表现在：
+- 技术成熟度不断提升
+- 产业生态日趋完善
+- 标准化程度逐步提高
+- 应用领域持续扩大
+
+面向未来，{topic}的发展趋势包括：
+- 技术融合程度进一步加深
+- 应用场景更加丰富多样
+- 产业规模持续扩大
+- 国际合作不断加强
+
+总体而言，{topic}具有广阔的发展前景和重要的战略价值，值得持续关注和深入研究。
+
+🔸 注意：这是演示内容，如需获得真实AI生成的内容，请配置API密钥。"""
+
+# 演示请求分派表：(关键词（小写）, 回复)，按顺序匹配第一项；
+# 回复为 None 表示润色请求，需根据原文生成
+_DEMO_RESPONSES = (
+    (("大纲", "outline"), _DEMO_OUTLINE),
+    (("润色", "polish"), None),
+    (("图表", "chart"), _DEMO_CHART),
+)
 
 class LLMClient:
     """
@@ -27,7 +164,8 @@ class LLMClient:
                  model_name: str = "gpt-3.5-turbo",
                  api_key: Optional[str] = None,
                  base_url: Optional[str] = None,
-                 temperature: float = 0.7):
+                 temperature: float = 0.7,
+                 max_output_tokens: Optional[int] = None):
         """
         初始化LLM客户端
         
@@ -37,10 +175,12 @@ class LLMClient:
             api_key: API密钥
             base_url: 自定义API地址
             temperature: 生成温度参数
+            max_output_tokens: 单次回复的输出token上限，默认按模型名确定（见 default_max_output_tokens）
         """
         self.model_type = model_type
         self.model_name = model_name
         self.temperature = temperature
+        self.max_output_tokens = max_output_tokens or default_max_output_tokens(model_name)
         
         # 从环境变量或参数获取配置
         if model_type == "openai":
@@ -54,51 +194,285 @@ class LLMClient:
             self.base_url = "demo"
         else:
             raise ValueError(f"不支持的模型类型: {model_type}")
+        
+        # 复用的HTTP客户端（首次调用时创建）：同步客户端全局共享，
+        # 异步客户端绑定到创建它的事件循环
+        self._openai_client = None
+        self._session = None
+        self._client_lock = threading.Lock()
+        self._async_loop = None
+        self._async_http = None
+        self._async_openai = None
+        
+        # 最近请求耗时（秒）的指数加权平均，用于估计该模型的典型耗时（如对冲请求的等待时间）
+        # 演示模式不访问网络，不计入
+        self.latency_ewma: Optional[float] = None
+        self._timed = model_type != "demo"
+        
+        # 按模型类型一次性绑定各调用入口（同步、异步、流式、异步流式），
+        # 之后的每次请求直接调用，不再逐个比较 model_type
+        backends = {
+            "openai": (self._call_openai, self._acall_openai, self._stream_openai, self._astream_openai),
+            "vllm": (self._call_vllm, self._acall_vllm, self._stream_vllm, self._astream_vllm),
+            "demo": (self._call_demo, self._acall_demo, self._stream_demo, self._astream_demo),
+        }
+        self._generate, self._agenerate, self._stream, self._astream = backends[model_type]
     
-    def generate_text(self, prompt: str, max_tokens: int = 1000) -> str:
+    def generate_text(self, prompt: str, max_tokens: int = 1000, system_prompt: Optional[str] = None,
+                      response_format: Optional[Dict[str, Any]] = None) -> str:
         """
         生成文本
         
         Args:
             prompt: 输入提示词
             max_tokens: 最大生成长度
+            system_prompt: 系统提示词（默认使用 DEFAULT_SYSTEM_PROMPT）；
+                固定的指令放在这里、动态内容放在prompt中，可以命中服务端的前缀缓存
+            response_format: 可选的输出格式约束（如 {"type": "json_object"}），
+                传给OpenAI/vLLM的同名参数；演示模式忽略
+            
+        Returns:
+            生成的文本内容
+        """
+        if not self._timed:
+            return self._generate(prompt, max_tokens, system_prompt, response_format)
+        start = time.perf_counter()
+        result = self._generate(prompt, max_tokens, system_prompt, response_format)
+        self._record_latency(result, time.perf_counter() - start)
+        return result
+    
+    async def agenerate_text(self, prompt: str, max_tokens: int = 1000, system_prompt: Optional[str] = None,
+                             response_format: Optional[Dict[str, Any]] = None) -> str:
+        """
+        异步生成文本
+        
+        Args:
+            prompt: 输入提示词
+            max_tokens: 最大生成长度
+            system_prompt: 系统提示词（默认使用 DEFAULT_SYSTEM_PROMPT）
+            response_format: 可选的输出格式约束，同 generate_text
             
         Returns:
             生成的文本内容
+            
+        为什么需要异步接口：
+        1. 并发：多个章节的请求可以在同一事件循环中用 asyncio.gather 同时发出
+        2. 连接复用：同一事件循环内的所有请求共享一个 httpx.AsyncClient，
+           避免每个请求重复建立TCP/TLS连接
         """
-        if self.model_type == "openai":
-            return self._call_openai(prompt, max_tokens)
-        elif self.model_type == "vllm":
-            return self._call_vllm(prompt, max_tokens)
-        elif self.model_type == "demo":
-            return self._call_demo(prompt, max_tokens)
+        if not self._timed:
+            return await self._agenerate(prompt, max_tokens, system_prompt, response_format)
+        start = time.perf_counter()
+        result = await self._agenerate(prompt, max_tokens, system_prompt, response_format)
+        self._record_latency(result, time.perf_counter() - start)
+        return result
+    
+    def _record_latency(self, result: str, seconds: float) -> None:
+        """记录一次成功请求的耗时（降级内容不计入）"""
+        if isinstance(result, DegradedText):
+            return
+        if self.latency_ewma is None:
+            self.latency_ewma = seconds
         else:
-            raise ValueError(f"不支持的模型类型: {self.model_type}")
+            self.latency_ewma = 0.8 * self.latency_ewma + 0.2 * seconds
     
-    def _call_openai(self, prompt: str, max_tokens: int) -> str:
-        """调用OpenAI API"""
-        try:
-            import openai
+    def stream_text(self, prompt: str, max_tokens: int = 1000, system_prompt: Optional[str] = None) -> Iterator[str]:
+        """
+        流式生成文本
+        
+        Args:
+            prompt: 输入提示词
+            max_tokens: 最大生成长度
+            system_prompt: 系统提示词（默认使用 DEFAULT_SYSTEM_PROMPT）
+            
+        Returns:
+            逐段产出生成内容的迭代器
             
-            # 检查API密钥
-            if not self.api_key or self.api_key in ["your_openai_api_key_here", "demo"]:
-                raise Exception("请配置有效的OpenAI API密钥")
+        为什么需要流式接口：
+        1. 降低首字延迟：无需等待完整响应即可开始处理
+        2. 流水线：下游可以边接收边解析（如逐行解析大纲）
+        """
+        return self._stream(prompt, max_tokens, system_prompt)
+    
+    def astream_text(self, prompt: str, max_tokens: int = 1000, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        异步流式生成文本
+        
+        Args:
+            prompt: 输入提示词
+            max_tokens: 最大生成长度
+            system_prompt: 系统提示词（默认使用 DEFAULT_SYSTEM_PROMPT）
             
-            # 初始化客户端
-            client = openai.OpenAI(
+        Returns:
+            逐段产出生成内容的异步迭代器
+        """
+        return self._astream(prompt, max_tokens, system_prompt)
+    
+    def _build_messages(self, prompt: str, system_prompt: Optional[str] = None) -> list:
+        """构建对话消息"""
+        return [
+            {"role": "system", "content": system_prompt or DEFAULT_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    
+    def _check_openai_key(self) -> None:
+        """检查OpenAI API密钥"""
+        if not self.api_key or self.api_key in ["your_openai_api_key_here", "demo"]:
+            raise Exception("请配置有效的OpenAI API密钥")
+    
+    def _get_openai_client(self):
+        """获取OpenAI客户端（首次调用时创建，之后的请求复用其连接池）"""
+        import openai
+        
+        # 检查API密钥
+        self._check_openai_key()
+        
+        if self._openai_client is None:
+            with self._client_lock:
+                if self._openai_client is None:
+                    self._openai_client = openai.OpenAI(
+                        api_key=self.api_key,
+                        base_url=self.base_url
+                    )
+        return self._openai_client
+    
+    def _get_async_http(self):
+        """
+        获取当前事件循环共享的 httpx.AsyncClient
+        
+        异步连接池绑定在创建它的事件循环上，事件循环变化时（如多次 asyncio.run）重新创建
+        """
+        import httpx
+        
+        loop = asyncio.get_running_loop()
+        if self._async_http is None or self._async_loop is not loop:
+            try:
+                import h2  # noqa: F401  HTTP/2 需要可选依赖 h2
+                http2 = True
+            except ImportError:
+                http2 = False
+            self._async_http = httpx.AsyncClient(
+                http2=http2,
+                limits=httpx.Limits(max_keepalive_connections=32),
+                timeout=60
+            )
+            self._async_openai = None
+            self._async_loop = loop
+        return self._async_http
+    
+    def _get_async_openai_client(self):
+        """获取异步OpenAI客户端（与当前事件循环的 httpx.AsyncClient 共享连接）"""
+        import openai
+        
+        self._check_openai_key()
+        
+        http_client = self._get_async_http()
+        if self._async_openai is None:
+            self._async_openai = openai.AsyncOpenAI(
                 api_key=self.api_key,
-                base_url=self.base_url
+                base_url=self.base_url,
+                http_client=http_client
             )
+        return self._async_openai
+    
+    def _get_session(self) -> "requests.Session":
+        """获取同步HTTP会话（首次调用时创建，之后的请求复用其连接池）"""
+        if self._session is None:
+            with self._client_lock:
+                if self._session is None:
+                    self._session = create_http_session()
+        return self._session
+    
+    def close(self) -> None:
+        """关闭同步HTTP会话，释放连接池"""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+    
+    async def aclose(self) -> None:
+        """关闭异步HTTP客户端（在创建它的事件循环结束前调用）"""
+        if self._async_http is not None:
+            await self._async_http.aclose()
+            self._async_http = None
+            self._async_openai = None
+            self._async_loop = None
+    
+    def _openai_fallback(self, error: Exception, prompt: str, max_tokens: int,
+                         system_prompt: Optional[str] = None) -> str:
+        """OpenAI调用失败时的降级内容"""
+        print(f"OpenAI API调用失败: {error}")
+        # 如果是API配置问题，提供友好提示
+        if "api" in str(error).lower() or "key" in str(error).lower():
+            return DegradedText("⚠️ OpenAI API调用失败，请检查API密钥配置。运行 `python configure_llm.py` 进行配置。", error)
+        return DegradedText(self._call_demo(prompt, max_tokens, system_prompt), error)  # 降级到演示模式
+    
+    def _vllm_fallback(self, error: Exception, prompt: str, max_tokens: int,
+                       system_prompt: Optional[str] = None) -> str:
+        """vLLM调用失败时的降级内容"""
+        if isinstance(error, _get_requests().exceptions.ConnectionError):
+            print(f"vLLM连接失败: 无法连接到 {self.base_url}")
+            return DegradedText("⚠️ vLLM服务连接失败，请检查服务是否启动。运行 `python configure_llm.py` 进行配置。", error)
+        print(f"vLLM API调用失败: {error}")
+        return DegradedText(self._call_demo(prompt, max_tokens, system_prompt), error)  # 降级到演示模式
+    
+    def _call_openai(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None,
+                     response_format: Optional[Dict[str, Any]] = None) -> str:
+        """调用OpenAI API"""
+        try:
+            client = self._get_openai_client()
             
             # 发送请求
             response = client.chat.completions.create(
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "你是一个专业的报告撰写助手，请根据用户需求生成高质量、详细的内容。"},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self._build_messages(prompt, system_prompt),
+                max_tokens=max_tokens,
+                temperature=self.temperature,
+                **({"response_format": response_format} if response_format else {})
+            )
+            
+            return response.choices[0].message.content.strip()
+            
+        except ImportError:
+            raise Exception("请安装openai库: pip install openai")
+        except Exception as e:
+            return self._openai_fallback(e, prompt, max_tokens, system_prompt)
+    
+    def _stream_openai(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None) -> Iterator[str]:
+        """流式调用OpenAI API"""
+        emitted = False
+        try:
+            client = self._get_openai_client()
+            stream = client.chat.completions.create(
+                model=self.model_name,
+                messages=self._build_messages(prompt, system_prompt),
                 max_tokens=max_tokens,
-                temperature=self.temperature
+                temperature=self.temperature,
+                stream=True
+            )
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    emitted = True
+                    yield delta
+        except ImportError:
+            raise Exception("请安装openai库: pip install openai")
+        except Exception as e:
+            if emitted:
+                raise  # 已输出部分内容时无法降级，交由调用方处理
+            yield self._openai_fallback(e, prompt, max_tokens, system_prompt)
+    
+    async def _acall_openai(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None,
+                            response_format: Optional[Dict[str, Any]] = None) -> str:
+        """异步调用OpenAI API"""
+        try:
+            client = self._get_async_openai_client()
+            
+            response = await client.chat.completions.create(
+                model=self.model_name,
+                messages=self._build_messages(prompt, system_prompt),
+                max_tokens=max_tokens,
+                temperature=self.temperature,
+                **({"response_format": response_format} if response_format else {})
             )
             
             return response.choices[0].message.content.strip()
@@ -106,13 +480,34 @@ class LLMClient:
         except ImportError:
             raise Exception("请安装openai库: pip install openai")
         except Exception as e:
-            print(f"OpenAI API调用失败: {e}")
-            # 如果是API配置问题，提供友好提示
-            if "api" in str(e).lower() or "key" in str(e).lower():
-                return "⚠️ OpenAI API调用失败，请检查API密钥配置。运行 `python configure_llm.py` 进行配置。"
-            return self._call_demo(prompt, max_tokens)  # 降级到演示模式
+            return self._openai_fallback(e, prompt, max_tokens, system_prompt)
+    
+    async def _astream_openai(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """异步流式调用OpenAI API"""
+        emitted = False
+        try:
+            client = self._get_async_openai_client()
+            stream = await client.chat.completions.create(
+                model=self.model_name,
+                messages=self._build_messages(prompt, system_prompt),
+                max_tokens=max_tokens,
+                temperature=self.temperature,
+                stream=True
+            )
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    emitted = True
+                    yield delta
+        except ImportError:
+            raise Exception("请安装openai库: pip install openai")
+        except Exception as e:
+            if emitted:
+                raise  # 已输出部分内容时无法降级，交由调用方处理
+            yield self._openai_fallback(e, prompt, max_tokens, system_prompt)
     
-    def _call_vllm(self, prompt: str, max_tokens: int) -> str:
+    def _call_vllm(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None,
+                   response_format: Optional[Dict[str, Any]] = None) -> str:
         """调用vLLM API"""
         try:
             # 构建请求URL
@@ -121,86 +516,170 @@ class LLMClient:
             # 构建请求数据
             data = {
                 "model": self.model_name,
-                "messages": [
-                    {"role": "system", "content": "你是一个专业的报告撰写助手，请根据用户需求生成高质量、详细的内容。"},
-                    {"role": "user", "content": prompt}
-                ],
+                "messages": self._build_messages(prompt, system_prompt),
                 "max_tokens": max_tokens,
                 "temperature": self.temperature
             }
+            if response_format:
+                data["response_format"] = response_format
             
             # 发送请求
-            response = requests.post(url, json=data, timeout=60)
+            response = self._get_session().post(url, json=data, timeout=60)
             response.raise_for_status()
             
             result = response.json()
             return result["choices"][0]["message"]["content"].strip()
             
-        except requests.exceptions.ConnectionError:
-            print(f"vLLM连接失败: 无法连接到 {self.base_url}")
-            return "⚠️ vLLM服务连接失败，请检查服务是否启动。运行 `python configure_llm.py` 进行配置。"
         except Exception as e:
-            print(f"vLLM API调用失败: {e}")
-            return self._call_demo(prompt, max_tokens)  # 降级到演示模式
-    
-    def _call_demo(self, prompt: str, max_tokens: int) -> str:
-        """演示模式 - 生成示例内容"""
-        # 根据prompt类型生成不同的演示内容
-        if "大纲" in prompt or "outline" in prompt.lower():
-            return """1. 概述与背景
-2. 现状分析
-3. 核心技术/方法
-4. 应用案例
-5. 发展趋势
-6. 挑战与机遇
-7. 结论与建议"""
+            return self._vllm_fallback(e, prompt, max_tokens, system_prompt)
+    
+    async def _acall_vllm(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None,
+                          response_format: Optional[Dict[str, Any]] = None) -> str:
+        """异步调用vLLM API（未安装httpx时在线程池中执行同步调用）"""
+        try:
+            import httpx
+        except ImportError:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._call_vllm, prompt, max_tokens, system_prompt, response_format)
         
-        elif "润色" in prompt or "polish" in prompt.lower():
-            # 如果是润色请求，返回稍微改进的内容
-            if len(prompt) > 100:
-                return prompt.replace("这是一个", "这是一个重要的").replace("需要", "亟需").replace("。", "，为行业发展提供了重要参考。")
+        try:
+            url = f"{self.base_url.rstrip('/')}/v1/chat/completions"
+            data = {
+                "model": self.model_name,
+                "messages": self._build_messages(prompt, system_prompt),
+                "max_tokens": max_tokens,
+                "temperature": self.temperature
+            }
+            if response_format:
+                data["response_format"] = response_format
             
-        elif "图表" in prompt or "chart" in prompt.lower():
-            return """建议生成以下图表：
-1. 发展趋势图 - 展示技术发展历程
-2. 对比分析图 - 不同方案的优劣对比
-3. 市场份额图 - 各厂商市场占比
-4. 流程图 - 核心技术实现流程"""
+            async def post():
+                response = await self._get_async_http().post(url, json=data)
+                response.raise_for_status()
+                return response
+            
+            # 连接失败、限流和服务端错误时退避重试（超时由 httpx 客户端控制）
+            response = await with_retry(post, timeout=None)
+            
+            result = response.json()
+            return result["choices"][0]["message"]["content"].strip()
+            
+        except httpx.ConnectError as e:
+            # 与同步路径一致，按连接失败给出提示
+            return self._vllm_fallback(_get_requests().exceptions.ConnectionError(e), prompt, max_tokens, system_prompt)
+        except Exception as e:
+            return self._vllm_fallback(e, prompt, max_tokens, system_prompt)
+    
+    def _stream_vllm(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None) -> Iterator[str]:
+        """流式调用vLLM API（OpenAI兼容的SSE格式）"""
+        emitted = False
+        try:
+            url = f"{self.base_url.rstrip('/')}/v1/chat/completions"
+            data = {
+                "model": self.model_name,
+                "messages": self._build_messages(prompt, system_prompt),
+                "max_tokens": max_tokens,
+                "temperature": self.temperature,
+                "stream": True
+            }
+            
+            with self._get_session().post(url, json=data, timeout=60, stream=True) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    choices = json.loads(payload).get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        emitted = True
+                        yield delta
+        except Exception as e:
+            if emitted:
+                raise  # 已输出部分内容时无法降级，交由调用方处理
+            yield self._vllm_fallback(e, prompt, max_tokens, system_prompt)
+    
+    async def _astream_vllm(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """异步流式调用vLLM API（未安装httpx时一次性产出完整结果）"""
+        try:
+            import httpx
+        except ImportError:
+            yield await self._acall_vllm(prompt, max_tokens, system_prompt)
+            return
+        
+        emitted = False
+        try:
+            url = f"{self.base_url.rstrip('/')}/v1/chat/completions"
+            data = {
+                "model": self.model_name,
+                "messages": self._build_messages(prompt, system_prompt),
+                "max_tokens": max_tokens,
+                "temperature": self.temperature,
+                "stream": True
+            }
+            
+            async with self._get_async_http().stream("POST", url, json=data) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line or not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    choices = json.loads(payload).get("choices") or [{}]
+                    delta = choices[0].get("delta", {}).get("content")
+                    if delta:
+                        emitted = True
+                        yield delta
+        except Exception as e:
+            if emitted:
+                raise  # 已输出部分内容时无法降级，交由调用方处理
+            if isinstance(e, httpx.ConnectError):
+                e = _get_requests().exceptions.ConnectionError(e)
+            yield self._vllm_fallback(e, prompt, max_tokens, system_prompt)
+    
+    def _call_demo(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None,
+                   response_format: Optional[Dict[str, Any]] = None) -> str:
+        """演示模式 - 生成示例内容（忽略 response_format）"""
+        # 根据请求类型（系统提示词 + 用户提示词）生成不同的演示内容；只转换一次小写
+        request = ((system_prompt or "") + prompt).lower()
+        for keywords, response in _DEMO_RESPONSES:
+            if any(keyword in request for keyword in keywords):
+                if response is not None:
+                    return response
+                # 润色请求：较长的内容返回稍微改进的版本，否则按默认内容生成
+                if len(prompt) > 100:
+                    return prompt.replace("这是一个", "这是一个重要的").replace("需要", "亟需").replace("。", "，为行业发展提供了重要参考。")
+                break
         
         # 默认内容生成
         topic = prompt.split("：")[-1] if "：" in prompt else prompt
-        return f"""
-{topic}是当前重要的研究领域和发展方向。
-
-在技术层面，{topic}具有以下特点：
-- 创新性强，技术架构先进
-- 应用场景广泛，市场前景良好  
-- 具备良好的可扩展性和兼容性
-- 安全性和稳定性不断提升
-
-从发展现状来看，{topic}正处于快速发展期，主要表现在：
-- 技术成熟度不断提升
-- 产业生态日趋完善
-- 标准化程度逐步提高
-- 应用领域持续扩大
-
-面向未来，{topic}的发展趋势包括：
-- 技术融合程度进一步加深
-- 应用场景更加丰富多样
-- 产业规模持续扩大
-- 国际合作不断加强
-
-总体而言，{topic}具有广阔的发展前景和重要的战略价值，值得持续关注和深入研究。
-
-🔸 注意：这是演示内容，如需获得真实AI生成的内容，请配置API密钥。
-""".strip()
+        return _DEMO_CONTENT.format_map({"topic": topic}).strip()
+    
+    async def _acall_demo(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None,
+                          response_format: Optional[Dict[str, Any]] = None) -> str:
+        """演示模式的异步入口"""
+        return self._call_demo(prompt, max_tokens, system_prompt)
+    
+    def _stream_demo(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None) -> Iterator[str]:
+        """演示模式的流式入口（一次性产出完整内容）"""
+        return iter((self._call_demo(prompt, max_tokens, system_prompt),))
     
-    def batch_generate(self, prompts: list, max_tokens: int = 1000) -> list:
+    async def _astream_demo(self, prompt: str, max_tokens: int, system_prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """演示模式的异步流式入口（一次性产出完整内容）"""
+        yield self._call_demo(prompt, max_tokens, system_prompt)
+    
+    def batch_generate(self, prompts: list, max_tokens: int = 1000, max_workers: Optional[int] = None) -> list:
         """
         批量生成文本
+        
+        各提示词的请求相互独立，用线程池并发发出（默认最多16个线程），结果按输入顺序返回
         """
-        results = []
-        for prompt in prompts:
-            result = self.generate_text(prompt, max_tokens)
-            results.append(result)
-        return results
+        if not prompts:
+            return []
+        
+        workers = max_workers or min(16, len(prompts))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda prompt: self.generate_text(prompt, max_tokens), prompts))
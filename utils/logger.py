@@ -1,7 +1,10 @@
 # 日志管理器 - 统一的日志记录
 
 import os
+import atexit
+import queue
 import logging
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from datetime import datetime
 from typing import Optional
 
@@ -26,44 +29,91 @@ class LogManager:
         self.log_level = getattr(logging, log_level.upper(), logging.INFO)
         self.enable_file_logging = enable_file_logging
         self.enable_console_logging = enable_console_logging
+        self._listener: Optional[QueueListener] = None
         
         # 创建日志目录
         if self.enable_file_logging:
             os.makedirs(self.log_dir, exist_ok=True)
         
-        # 设置日志格式
+        # 设置日志格式：文件日志带时间戳（精确到秒，不格式化毫秒）；
+        # 控制台日志是实时查看的，不带时间戳，省去每条记录的时间格式化
         self.formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+        self.console_formatter = logging.Formatter(
+            '%(name)s - %(levelname)s - %(message)s'
         )
         
         # 配置根日志器
         self._setup_root_logger()
+        # fork 出的子进程（如图表渲染进程池）中没有后台写日志线程，改为直接写入
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork_in_child)
     
     def _setup_root_logger(self):
         """设置根日志器"""
         root_logger = logging.getLogger()
         root_logger.setLevel(self.log_level)
         
-        # 清除现有的处理器
+        # 清除现有的处理器（重复初始化时先停掉上一个后台写日志线程）
         root_logger.handlers.clear()
+        self.stop()
+        
+        handlers = []
         
-        # 添加控制台处理器
+        # 控制台处理器
         if self.enable_console_logging:
             console_handler = logging.StreamHandler()
             console_handler.setLevel(self.log_level)
-            console_handler.setFormatter(self.formatter)
-            root_logger.addHandler(console_handler)
+            console_handler.setFormatter(self.console_formatter)
+            handlers.append(console_handler)
         
-        # 添加文件处理器
+        # 文件处理器：delay=True 时直到第一条日志写入才打开文件；按大小轮转，长时间运行不会无限增长
         if self.enable_file_logging:
             log_file = os.path.join(
                 self.log_dir, 
                 f"report_system_{datetime.now().strftime('%Y%m%d')}.log"
             )
-            file_handler = logging.FileHandler(log_file, encoding='utf-8')
+            file_handler = RotatingFileHandler(
+                log_file, maxBytes=10 * 1024 * 1024, backupCount=5,
+                encoding='utf-8', delay=True
+            )
             file_handler.setLevel(self.log_level)
             file_handler.setFormatter(self.formatter)
-            root_logger.addHandler(file_handler)
+            handlers.append(file_handler)
+        
+        # 为什么通过队列输出：
+        # 业务线程和事件循环中的协程只把日志记录放入队列，控制台和磁盘写入由后台线程完成，
+        # 不会因输出阻塞；所有处理器都挂在根日志器上，宿主程序仍可按常规方式调整或接管
+        if handlers:
+            log_queue = queue.SimpleQueue()
+            root_logger.addHandler(QueueHandler(log_queue))
+            self._listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+            self._listener.start()
+            # 进程退出时写完队列中剩余的日志
+            atexit.register(self.stop)
+    
+    def stop(self):
+        """停止后台写日志线程，并写完队列中剩余的日志"""
+        if self._listener is not None:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+    
+    def _after_fork_in_child(self):
+        """子进程中不存在父进程的后台线程：把队列处理器换回实际的处理器，直接写入"""
+        listener = self._listener
+        if listener is None:
+            return
+        root_logger = logging.getLogger()
+        for handler in list(root_logger.handlers):
+            if isinstance(handler, QueueHandler) and handler.queue is listener.queue:
+                root_logger.removeHandler(handler)
+                for target in listener.handlers:
+                    root_logger.addHandler(target)
+        self._listener = None
     
     def get_logger(self, name: str) -> logging.Logger:
         """
@@ -88,12 +138,13 @@ class LogManager:
         """
         logger = self.get_logger(f"Agent.{agent_name}")
         
+        # 参数延迟格式化：级别被过滤时不拼接消息
         if status.upper() == "ERROR":
-            logger.error(f"[{agent_name}] {activity}")
+            logger.error("[%s] %s", agent_name, activity)
         elif status.upper() == "WARNING":
-            logger.warning(f"[{agent_name}] {activity}")
+            logger.warning("[%s] %s", agent_name, activity)
         else:
-            logger.info(f"[{agent_name}] {activity}")
+            logger.info("[%s] %s", agent_name, activity)
     
     def log_user_action(self, action: str, details: Optional[str] = None):
         """
@@ -104,10 +155,10 @@ class LogManager:
             details: 操作详情
         """
         logger = self.get_logger("UserAction")
-        message = f"用户操作: {action}"
         if details:
-            message += f" - {details}"
-        logger.info(message)
+            logger.info("用户操作: %s - %s", action, details)
+        else:
+            logger.info("用户操作: %s", action)
     
     def log_performance(self, operation: str, duration: float, details: Optional[str] = None):
         """
@@ -119,10 +170,10 @@ class LogManager:
             details: 附加信息
         """
         logger = self.get_logger("Performance")
-        message = f"性能统计: {operation} 耗时 {duration:.2f}s"
         if details:
-            message += f" - {details}"
-        logger.info(message)
+            logger.info("性能统计: %s 耗时 %.2fs - %s", operation, duration, details)
+        else:
+            logger.info("性能统计: %s 耗时 %.2fs", operation, duration)
 
-# 全局日志管理器实例
-log_manager = LogManager()
+# 全局日志管理器实例（日志级别可通过 LOG_LEVEL 环境变量调整，如 WARNING 可关闭进度日志）
+log_manager = LogManager(log_level=os.getenv("LOG_LEVEL", "INFO"))
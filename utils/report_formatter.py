@@ -5,9 +5,22 @@
 import json
 import re
 from datetime import datetime
-from typing import Dict, List, Any
-from docx import Document
-from docx.shared import Inches
+from typing import Any, Dict, Iterator, List
+
+# 优先使用orjson序列化JSON报告（输出与标准库 indent=2、ensure_ascii=False 相同），未安装时回退到标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# clean_text 使用的正则（模块级预编译）
+_WS_RE = re.compile(r'\s+')
+
+# 段落：以空行分隔的若干连续非空行（与 split('\n\n') 后去掉空白段的结果相同）
+_PARAGRAPH_RE = re.compile(r'[^\n]+(?:\n(?!\n)[^\n]+)*')
+
+# 可在Markdown中以图片形式内嵌的图表文件扩展名
+_IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.svg', '.gif')
 
 class ReportFormatter:
     """
@@ -34,35 +47,39 @@ class ReportFormatter:
         3. 版本控制：纯文本格式，便于Git版本控制
         4. 协作性：便于团队协作和代码审查
         """
-        markdown_content = []
+        return "".join(self.iter_markdown(report_data))
+    
+    def iter_markdown(self, report_data: Dict[str, Any]) -> Iterator[str]:
+        """
+        按顺序产出Markdown报告的各个片段（拼接后与 format_markdown 相同）
         
-        # 添加标题和元数据
+        大型报告可以逐段写入文件（见 utils.file_writer.atomic_write_chunks），不必先拼出完整字符串
+        """
         title = report_data.get('title', '未命名报告')
-        markdown_content.append(f"# {title}\n")
-        markdown_content.append(f"**生成时间**: {self.creation_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
-        markdown_content.append(f"**生成系统**: 多智能体报告生成系统\n\n")
         
-        # 添加目录
+        # 标题和元数据
+        yield (
+            f"# {title}\n"
+            f"**生成时间**: {self.creation_time.strftime('%Y-%m-%d %H:%M:%S')}\n"
+            "**生成系统**: 多智能体报告生成系统\n\n"
+        )
+        
+        # 目录
         if 'outline' in report_data:
-            markdown_content.append("## 目录\n")
-            for i, section in enumerate(report_data['outline'], 1):
-                markdown_content.append(f"{i}. {section}\n")
-            markdown_content.append("\n")
+            toc = "".join(f"{i}. {section}\n" for i, section in enumerate(report_data['outline'], 1))
+            yield f"## 目录\n{toc}\n"
         
-        # 添加各章节内容
+        # 各章节内容
         if 'sections' in report_data:
             for section_title, content in report_data['sections'].items():
-                markdown_content.append(f"## {section_title}\n\n")
-                markdown_content.append(f"{content}\n\n")
+                yield f"## {section_title}\n\n{content}\n\n"
         
-        # 添加图表引用
+        # 图表引用：图片内嵌，HTML表格等非图片文件以链接形式引用
         if 'charts' in report_data:
-            markdown_content.append("## 附录：图表\n\n")
+            yield "## 附录：图表\n\n"
             for chart_name, chart_path in report_data['charts'].items():
-                markdown_content.append(f"### {chart_name}\n\n")
-                markdown_content.append(f"![{chart_name}]({chart_path})\n\n")
-        
-        return "".join(markdown_content)
+                image = '!' if chart_path.lower().endswith(_IMAGE_EXTENSIONS) else ''
+                yield f"### {chart_name}\n\n{image}[{chart_name}]({chart_path})\n\n"
     
     def format_docx(self, report_data: Dict[str, Any], output_path: str):
         """
@@ -73,7 +90,11 @@ class ReportFormatter:
         2. 格式丰富：支持复杂的格式和布局
         3. 易于分享：便于与非技术人员分享
         4. 打印友好：适合打印和正式文档
+        
+        python-docx 在这里才导入：只输出Markdown/JSON时不加载它，未安装时由调用方处理 ImportError
         """
+        from docx import Document
+        
         doc = Document()
         
         # 添加标题
@@ -96,11 +117,11 @@ class ReportFormatter:
         if 'sections' in report_data:
             for section_title, content in report_data['sections'].items():
                 doc.add_heading(section_title, level=1)
-                # 处理段落
-                paragraphs = content.split('\n\n')
-                for paragraph in paragraphs:
-                    if paragraph.strip():
-                        doc.add_paragraph(paragraph.strip())
+                # 逐个处理段落，不预先拆分出整个段落列表
+                for match in _PARAGRAPH_RE.finditer(content):
+                    paragraph = match.group().strip()
+                    if paragraph:
+                        doc.add_paragraph(paragraph)
         
         # 保存文档
         doc.save(output_path)
@@ -127,6 +148,8 @@ class ReportFormatter:
             'content': report_data
         }
         
+        if orjson is not None:
+            return orjson.dumps(formatted_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode('utf-8')
         return json.dumps(formatted_data, ensure_ascii=False, indent=2)
     
     def clean_text(self, text: str) -> str:
@@ -139,16 +162,9 @@ class ReportFormatter:
         3. 兼容性：避免特殊字符导致的问题
         4. 质量：提升整体文档质量
         """
-        # 移除多余的空白字符
-        text = re.sub(r'\s+', ' ', text)
-        
-        # 规范化换行符
-        text = re.sub(r'\n\s*\n', '\n\n', text)
-        
-        # 移除首尾空白
-        text = text.strip()
-        
-        return text
+        # 所有连续空白（包括换行）合并为一个空格，再移除首尾空白；
+        # 合并后文本中已没有换行符，无需再单独规范化空行
+        return _WS_RE.sub(' ', text).strip()
     
     def add_table_of_contents(self, sections: List[str]) -> str:
         """
@@ -0,0 +1,113 @@
+"""
+超时与重试
+为异步LLM调用提供有界等待和带抖动的指数退避重试
+"""
+import asyncio
+import random
+from typing import Any, Awaitable, Callable, Optional
+
+# 可以重试的HTTP状态码（超时、冲突、限流和服务端错误）
+_RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+# 第三方库的网络异常按类名识别（含父类），无需导入这些库：
+# httpx.TransportError、openai.APIConnectionError（含 APITimeoutError）、
+# requests.exceptions.ConnectionError / Timeout
+_RETRYABLE_NAMES = frozenset({"TransportError", "APIConnectionError", "ConnectionError", "Timeout"})
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    判断异常是否值得重试
+
+    为什么需要区分：
+    1. 暂时性错误（超时、连接中断、429、5xx）重试后通常能成功
+    2. 请求本身的错误（400、401等）重试也不会成功，只会浪费时间和配额
+    """
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status in _RETRYABLE_STATUS
+
+    return any(cls.__name__ in _RETRYABLE_NAMES for cls in type(error).__mro__)
+
+
+async def with_retry(coro_fn: Callable[[], Awaitable[Any]],
+                     *,
+                     attempts: int = 3,
+                     base: float = 0.5,
+                     cap: float = 8.0,
+                     timeout: Optional[float] = 60.0,
+                     retry_on: Callable[[BaseException], bool] = is_retryable,
+                     on_retry: Optional[Callable[[int, BaseException, float], None]] = None) -> Any:
+    """
+    带超时和重试地执行协程
+
+    Args:
+        coro_fn: 每次调用返回一个新协程的函数（协程只能await一次）
+        attempts: 最多尝试次数
+        base: 退避的基础等待秒数，第k次重试前等待 min(cap, base * 2**k) 加随机抖动
+        cap: 单次退避的最长等待秒数
+        timeout: 每次尝试的超时秒数，为None时不限制
+        retry_on: 判断异常是否可重试的函数
+        on_retry: 可选的回调 on_retry(已失败次数, 异常, 等待秒数)，在每次重试前调用
+
+    Returns:
+        协程的返回值；最后一次尝试仍失败或遇到不可重试的异常时抛出该异常
+
+    为什么需要抖动：
+    多个并发请求同时失败时（如同时被限流），随机错开重试时间，避免再次同时冲击服务
+    """
+    for attempt in range(attempts):
+        try:
+            if timeout is None:
+                return await coro_fn()
+            return await asyncio.wait_for(coro_fn(), timeout)
+        except Exception as e:
+            if attempt + 1 >= attempts or not retry_on(e):
+                raise
+            delay = min(cap, base * 2 ** attempt) + random.uniform(0, 0.5 * base)
+            if on_retry is not None:
+                on_retry(attempt + 1, e, delay)
+            await asyncio.sleep(delay)
+
+
+async def hedged(coro_factory: Callable[[], Awaitable[Any]], delay: float, n: int = 2) -> Any:
+    """
+    对冲请求：先发出一个请求，超过 delay 秒仍未完成时再发出相同的请求，取最先成功的结果
+
+    Args:
+        coro_factory: 每次调用返回一个新协程的函数
+        delay: 发出下一个请求前等待的秒数（通常取该模型的典型耗时）
+        n: 最多同时发出的请求数
+
+    Returns:
+        最先成功完成的请求结果；所有请求都失败时抛出最后一个异常
+
+    为什么需要对冲：
+    1. 长尾：偶发的慢请求会拖住所有依赖它的后续步骤
+    2. 成本可控：只在请求明显慢于平常时才发出第二个请求，且只用于关键路径上的少数调用
+    """
+    pending = {asyncio.ensure_future(coro_factory())}
+    started = 1
+    last_error: Optional[BaseException] = None
+    try:
+        while pending:
+            timeout = delay if started < n else None
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+            # 等待超时或已有请求失败时，再发出一个相同的请求
+            if started < n:
+                pending.add(asyncio.ensure_future(coro_factory()))
+                started += 1
+        raise last_error
+    finally:
+        # 取消仍未完成的请求
+        for task in pending:
+            task.cancel()